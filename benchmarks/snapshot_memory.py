@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Peak memory of a fabric snapshot, API dicts vs. compact records
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+Usage: python benchmarks/snapshot_memory.py [--count 50000]
+
+The synthetic list responses are written to a temporary directory and each
+variant runs in its own process, so neither generating them nor the other
+variant raises the measured peak RSS. "dicts" holds the API objects with their template configs parsed,
+as the bulk operations did before module_utils/dcnm_model.py. "records" holds
+the snapshot as VrfRecord/NetworkRecord objects and parses every template
+config once, as a plan over the whole fabric does.
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module_utils', 'dcnm_model.py')
+
+
+def load_model():
+    # module_utils normally live in the ansible.module_utils namespace, load
+    # dcnm_model straight from its file since it has no ansible imports
+    try:
+        import importlib.util
+    except ImportError:
+        import imp
+        return imp.load_source('dcnm_model', MODEL_PATH)
+    spec = importlib.util.spec_from_file_location('dcnm_model', MODEL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def proc_status_mb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024.0
+
+
+def reset_peak_rss():
+    """Reset the peak RSS to the current RSS and return it.
+
+    Only Linux can reset the peak (VmHWM). Elsewhere the peak of the whole
+    process is reported, including reading the response bodies.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return proc_status_mb('VmRSS')
+    except (IOError, OSError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    try:
+        return proc_status_mb('VmHWM')
+    except (IOError, OSError):
+        pass
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024.0
+    return rss / 1024.0
+
+
+def synthetic_vrf(i):
+    name = "Tenant%d_VRF_%d" % (i // 100, 50000 + i)
+    return dict(
+        fabric="fabric1", vrfName=name, vrfTemplate="Default_VRF_Universal",
+        vrfExtensionTemplate="Default_VRF_Extension_Universal", vrfId=50000 + i,
+        vrfTemplateConfig=json.dumps(dict(
+            vrfSegmentId=str(50000 + i), vrfName=name, vrfVlanId=str(2000 + i % 1000), vrfVlanName="",
+            vrfIntfDescription="", vrfDescription="", mtu="9216", tag="12345", vrfRouteMap="FABRIC-RMAP-REDIST-SUBNET",
+            maxBgpPaths="1", maxIbgpPaths="2", ipv6LinkLocalFlag="true", nveId="1", asn="65500",
+        )),
+        tenantName=None, id=i, serviceVrfTemplate=None, source=None, vrfStatus="DEPLOYED",
+        hierarchicalKey="fabric1",
+    )
+
+
+def synthetic_network(i, vrf_name):
+    name = "Tenant%d_Net_%d" % (i // 900, 30000 + i)
+    return dict(
+        fabric="fabric1", networkName=name, vrf=vrf_name,
+        networkTemplate="Default_Network_Universal", networkExtensionTemplate="Default_Network_Extension_Universal",
+        networkId=30000 + i,
+        networkTemplateConfig=json.dumps(dict(
+            suppressArp="true", secondaryGW2="", secondaryGW1="", vlanId=str(2300 + i % 1500), gatewayIpAddress="10.%d.%d.1/24" % (i // 256 % 256, i % 256),
+            enableIR="false", mcastGroup="239.1.1.0", dhcpServerAddr1="", dhcpServerAddr2="", segmentId=str(30000 + i),
+            vrfName=vrf_name, networkName=name, isLayer2Only="false", nveId="1", intfDescription="",
+            mtu="", vlanName="", tag="12345", trmEnabled="false", loopbackId="", rtBothAuto="false", enableL3OnBorder="false",
+        )),
+        serviceNetworkTemplate=None, source=None, tenantName=None, id=i, networkStatus="DEPLOYED",
+        hierarchicalKey="fabric1",
+    )
+
+
+def write_synthetic_fabric(directory, count):
+    """Write the VRF and network list responses of a fabric, 1 VRF per 9 networks."""
+    vrf_count = max(1, count // 10)
+    with open(os.path.join(directory, 'vrfs.json'), 'w') as f:
+        f.write("[" + ",".join(json.dumps(synthetic_vrf(i)) for i in range(vrf_count)) + "]")
+    with open(os.path.join(directory, 'networks.json'), 'w') as f:
+        f.write("[" + ",".join(
+            json.dumps(synthetic_network(i, synthetic_vrf(i % vrf_count)['vrfName'])) for i in range(count - vrf_count)
+        ) + "]")
+
+
+def run_variant(variant, directory):
+    # the response bodies are held as bytes, as requests does
+    with open(os.path.join(directory, 'vrfs.json'), 'rb') as f:
+        vrfs_text = f.read()
+    with open(os.path.join(directory, 'networks.json'), 'rb') as f:
+        networks_text = f.read()
+    gc.collect()
+    baseline = reset_peak_rss()
+    started = time.time()
+
+    if variant == 'dicts':
+        vrfs = dict((vrf['vrfName'], vrf) for vrf in json.loads(vrfs_text))
+        networks = dict((net['networkName'], net) for net in json.loads(networks_text))
+        for obj in vrfs.values():
+            obj['vrfTemplateConfig'] = json.loads(obj['vrfTemplateConfig'])
+        for obj in networks.values():
+            obj['networkTemplateConfig'] = json.loads(obj['networkTemplateConfig'])
+    else:
+        model = load_model()
+        vrfs = model.index_records(model.iter_json_array(vrfs_text.decode('utf-8')), model.VrfRecord)
+        networks = model.index_records(model.iter_json_array(networks_text.decode('utf-8')), model.NetworkRecord)
+        # what a plan over the whole fabric does, DCNM.diff_attrs parses and
+        # compares the template config of every object
+        for obj in vrfs.values():
+            json.loads(obj['vrfTemplateConfig'])
+        for obj in networks.values():
+            obj.get('vrf')
+            json.loads(obj['networkTemplateConfig'])
+
+    elapsed = time.time() - started
+    print(json.dumps(dict(variant=variant, count=len(vrfs) + len(networks), baseline_mb=baseline, peak_mb=peak_rss_mb(), seconds=elapsed)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--count', type=int, default=50000, help='number of VRFs and networks in the fabric')
+    parser.add_argument('--variant', choices=['dicts', 'records'], help=argparse.SUPPRESS)
+    parser.add_argument('--dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant is not None:
+        run_variant(args.variant, args.dir)
+        return
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_synthetic_fabric(directory, args.count)
+
+        print("%-8s %8s %12s %12s %12s %8s" % ("variant", "objects", "base RSS MB", "peak RSS MB", "snapshot MB", "seconds"))
+        for variant in ('dicts', 'records'):
+            out = subprocess.check_output([sys.executable, __file__, '--variant', variant, '--dir', directory])
+            r = json.loads(out.decode('utf-8'))
+            print("%-8s %8d %12.1f %12.1f %12.1f %8.2f" % (r['variant'], r['count'], r['baseline_mb'], r['peak_mb'], r['peak_mb'] - r['baseline_mb'], r['seconds']))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,12 +45,12 @@ RETURN = '''
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.dcnm import DCNM, dcnm_argument_spec
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec
 
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
-    module_args = dcnm_argument_spec
+    module_args = dict(dcnm_argument_spec)
     module_args.update(
         method=dict(type='str', required=False, default='GET'),
         endpoint=dict(type='str', required=True),
@@ -69,7 +69,7 @@ def run_module():
     )
 
     try:
-        dcnm = DCNM(module.params['baseurl'], module.params['username'], module.params['password'], verify=module.params['verify'])
+        dcnm = dcnm_from_module(module)
 
         dcnm.login()
 
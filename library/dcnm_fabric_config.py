@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""dcnm_fabric_config module
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: dcnm_fabric_config
+
+short_description: Export or import all VRFs and networks of a Cisco DCNM fabric
+
+version_added: "2.4"
+
+description:
+    - "Export every VRF and network of a fabric to a versioned JSON lines file, or import such a file into a fabric, possibly on another DCNM."
+    - "Imports are planned against the target fabric with one list request per object kind and then applied concurrently, VRFs before networks. Objects that are already up to date are left alone."
+
+options:
+  baseurl:
+    description:
+    - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
+    required: yes
+    type: list
+  username:
+    description:
+    - 'Username for DCNM API'
+    required: yes
+  password:
+    description:
+    - 'Password for DCNM API'
+    required: yes
+  verify:
+    description:
+    - 'Verify SSL certificates of DCNM REST API.'
+    required: no
+    type: bool
+    default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
+  fabric_name:
+    description:
+    - 'Fabric name with DCNM. The fabric exported from or imported into.'
+    required: yes
+  path:
+    description:
+    - 'Path of the export file.'
+    required: yes
+    type: path
+  mode:
+    description:
+    - 'Whether to export the fabric to path or import path into the fabric.'
+    required: yes
+    choices: [ export, import ]
+  workers:
+    description:
+    - 'Number of concurrent requests used when importing.'
+    required: no
+    type: int
+    default: 8
+
+author:
+    - Chris Gascoigne (@cgascoig)
+'''
+
+EXAMPLES = '''
+- name: export fabric
+  dcnm_fabric_config:
+    <<: *api_info
+    fabric_name: MyFabric
+    path: MyFabric.jsonl
+    mode: export
+
+- name: clone it into another fabric
+  dcnm_fabric_config:
+    <<: *api_info
+    fabric_name: MyOtherFabric
+    path: MyFabric.jsonl
+    mode: import
+    workers: 16
+'''
+
+RETURN = '''
+counts:
+    description: Number of VRFs and networks exported.
+    type: dict
+summary:
+    description: Number of creates and updates per object kind needed by the import, e.g. network_create.
+    type: dict
+failed_entries:
+    description: Import actions that failed, with their error.
+    type: list
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec
+from ansible.module_utils.dcnm_bulk import apply_plan, export_fabric, fetch_snapshot, plan_fabric, plan_summary, read_export
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(dcnm_argument_spec)
+    module_args.update(
+        fabric_name=dict(type='str', required=True),
+        path=dict(type='path', required=True),
+        mode=dict(type='str', choices=['export', 'import'], required=True),
+        workers=dict(type='int', required=False, default=8),
+    )
+
+    # seed the result dict
+    result = dict(
+        changed=False,
+        ansible_facts=dict()
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    try:
+        dcnm = dcnm_from_module(module)
+
+        dcnm.login()
+
+        if module.params['mode'] == 'export':
+            if module.check_mode:
+                module.exit_json(**result)
+
+            with open(module.params['path'], 'w') as f:
+                result['counts'] = export_fabric(dcnm, module.params['fabric_name'], f)
+            result['changed'] = True
+            module.exit_json(**result)
+
+        with open(module.params['path']) as f:
+            header, vrfs, networks = read_export(f)
+
+        snapshot = fetch_snapshot(dcnm, module.params['fabric_name'])
+        plan = plan_fabric(dcnm, snapshot, module.params['fabric_name'], vrfs, networks)
+        result['summary'] = plan_summary(plan)
+        result['changed'] = len(plan) > 0
+
+        if not module.check_mode:
+            failed = apply_plan(dcnm, plan, workers=module.params['workers'])
+            if failed:
+                result['failed_entries'] = failed
+                module.fail_json(msg="%d of %d import actions failed" % (len(failed), len(plan)), **result)
+
+        module.exit_json(**result)
+
+    except Exception as e:
+        module.fail_json(msg=str(e), result=result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -44,7 +44,9 @@ options:
   baseurl:
     description:
     - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
     required: yes
+    type: list
   username:
     description:
     - 'Username for DCNM API'
@@ -59,6 +61,43 @@ options:
     required: no
     type: bool
     default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
+  inventory_db:
+    description:
+    - 'Path of a local SQLite database to persist the gathered fabrics, VRFs and networks into. Use the dcnm_inventory lookup plugin to query it.'
+    required: no
+    type: path
+  inventory_fabrics:
+    description:
+    - 'Fabric names whose VRFs and networks are persisted into inventory_db. Defaults to all fabrics.'
+    required: no
+    type: list
 
 author:
     - Chris Gascoigne (@cgascoig)
@@ -71,6 +110,16 @@ EXAMPLES = '''
     username: admin
     password: password
     verify: no
+
+- name: Gather facts and persist them for the dcnm_inventory lookup
+  dcnm_facts:
+    baseurl: https://10.1.1.1/rest
+    username: admin
+    password: password
+    verify: no
+    inventory_db: /var/lib/dcnm/inventory.db
+    inventory_fabrics:
+      - MyFabric
 '''
 
 RETURN = '''
@@ -80,12 +129,17 @@ dcnm_fabrics:
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.dcnm import DCNM, dcnm_argument_spec
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec
+from ansible.module_utils.dcnm_store import DCNMStore
 
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
-    module_args = dcnm_argument_spec
+    module_args = dict(dcnm_argument_spec)
+    module_args.update(
+        inventory_db=dict(type='path', required=False, default=None),
+        inventory_fabrics=dict(type='list', required=False, default=None),
+    )
 
     # seed the result dict
     result = dict(
@@ -100,10 +154,28 @@ def run_module():
 
 
     try:
-        dcnm = DCNM(module.params['baseurl'], module.params['username'], module.params['password'], verify=module.params['verify'])
+        dcnm = dcnm_from_module(module)
 
         dcnm.login()
-        result['ansible_facts']['dcnm_fabrics'] = dcnm.request("GET", "/control/fabrics")
+        fabrics = dcnm.request("GET", "/control/fabrics")
+        result['ansible_facts']['dcnm_fabrics'] = fabrics
+
+        if module.params['inventory_db'] is not None:
+            fabric_names = module.params['inventory_fabrics']
+            if fabric_names is None:
+                fabric_names = [fabric['fabricName'] for fabric in fabrics]
+
+            # fabrics are fetched one at a time as they are written and the
+            # list responses decoded one object at a time
+            def fetch():
+                for fabric_name in fabric_names:
+                    yield fabric_name, dcnm.get_vrfs(fabric_name, stream=True), dcnm.get_nets(fabric_name, stream=True)
+
+            store = DCNMStore(module.params['inventory_db'])
+            try:
+                store.save_inventory(fabrics, fetch())
+            finally:
+                store.close()
 
         # successful execution
         module.exit_json(**result)
@@ -44,7 +44,9 @@ options:
   baseurl:
     description:
     - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
     required: yes
+    type: list
   username:
     description:
     - 'Username for DCNM API'
@@ -59,6 +61,33 @@ options:
     required: no
     type: bool
     default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
   fabric_name:
     description:
     - 'Fabric name with DCNM'
@@ -141,22 +170,16 @@ RETURN = '''
 '''
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.dcnm import DCNM, dcnm_argument_spec
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec, network_argument_spec
 import json
 
 def run_module():
     # define available arguments/parameters a user can pass to the module
-    module_args = dcnm_argument_spec
+    module_args = dict(dcnm_argument_spec)
     module_args.update(
         fabric_name=dict(type='str', required=True),
-        vrf_name=dict(type='str', required=True),
-        network_name=dict(type='str', required=True),
-        network_id=dict(type='int', required=True),
-        network_template=dict(type='str', required=False, default="Default_Network_Universal"),
-        network_extension_template=dict(type='str', required=False, default="Default_Network_Extension_Universal"),
-        network_template_config=dict(type='dict', required=True),
-        state=dict(type='str', choices=['present', 'absent'], default='present'),
     )
+    module_args.update(network_argument_spec)
 
     # seed the result dict
     result = dict(
@@ -170,7 +193,7 @@ def run_module():
     )
 
     try:
-        dcnm = DCNM(module.params['baseurl'], module.params['username'], module.params['password'], verify=module.params['verify'])
+        dcnm = dcnm_from_module(module)
 
         dcnm.login()
 
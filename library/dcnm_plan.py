@@ -0,0 +1,208 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""dcnm_plan module
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: dcnm_plan
+
+short_description: Plan VRF and network changes within Cisco DCNM without applying them
+
+version_added: "2.4"
+
+description:
+    - "Compute the creates, updates and deletes needed to bring a fabric in line with a list of VRFs and networks, with field-level diffs. Nothing is ever written to DCNM."
+    - "The current state is read with one list request per object kind, or from the inventory written by dcnm_facts when snapshot_db is set, in which case DCNM is not contacted at all."
+
+options:
+  baseurl:
+    description:
+    - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
+    required: yes
+    type: list
+  username:
+    description:
+    - 'Username for DCNM API'
+    required: yes
+  password:
+    description:
+    - 'Password for DCNM API'
+    required: yes
+  verify:
+    description:
+    - 'Verify SSL certificates of DCNM REST API.'
+    required: no
+    type: bool
+    default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
+  fabric_name:
+    description:
+    - 'Fabric name with DCNM'
+    required: yes
+  vrfs:
+    description:
+    - 'VRFs, each with the same options as the dcnm_vrf module except fabric_name.'
+    required: no
+    type: list
+    default: []
+  networks:
+    description:
+    - 'Networks, each with the same options as the dcnm_network module except fabric_name.'
+    required: no
+    type: list
+    default: []
+  snapshot_db:
+    description:
+    - 'Path of an inventory database written by dcnm_facts with inventory_db. When set the plan is computed from it instead of DCNM.'
+    required: no
+    type: path
+  plan_path:
+    description:
+    - 'Also write the plan as JSON to this file.'
+    required: no
+    type: path
+
+author:
+    - Chris Gascoigne (@cgascoig)
+'''
+
+EXAMPLES = '''
+- name: plan fabric changes
+  dcnm_plan:
+    <<: *api_info
+    fabric_name: MyFabric
+    vrfs: "{{ fabric_vrfs }}"
+    networks: "{{ fabric_networks }}"
+    plan_path: plan.json
+  register: plan
+
+- name: fail CI when the fabric is not in sync
+  assert:
+    that: not plan.changed
+'''
+
+RETURN = '''
+plan:
+    description: Ordered list of actions. Each has action (create, update or delete), kind (vrf or network), name, diff (API attribute -> before/after, per key for template configs) and params.
+    type: list
+summary:
+    description: Number of actions per kind and action, e.g. network_create.
+    type: dict
+'''
+
+import json
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec, vrf_argument_spec, network_argument_spec
+from ansible.module_utils.dcnm_bulk import fetch_snapshot, plan_fabric, plan_summary
+from ansible.module_utils.dcnm_store import DCNMStore
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(dcnm_argument_spec)
+    module_args.update(
+        fabric_name=dict(type='str', required=True),
+        vrfs=dict(type='list', elements='dict', options=vrf_argument_spec, required=False, default=[]),
+        networks=dict(type='list', elements='dict', options=network_argument_spec, required=False, default=[]),
+        snapshot_db=dict(type='path', required=False, default=None),
+        plan_path=dict(type='path', required=False, default=None),
+    )
+
+    # seed the result dict
+    result = dict(
+        changed=False,
+        ansible_facts=dict()
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    try:
+        dcnm = dcnm_from_module(module)
+
+        if module.params['snapshot_db'] is not None:
+            store = DCNMStore(module.params['snapshot_db'])
+            try:
+                snapshot = store.snapshot(module.params['fabric_name'])
+            finally:
+                store.close()
+        else:
+            dcnm.login()
+            snapshot = fetch_snapshot(dcnm, module.params['fabric_name'])
+
+        plan = plan_fabric(dcnm, snapshot, module.params['fabric_name'], module.params['vrfs'], module.params['networks'])
+
+        if module.params['plan_path'] is not None:
+            with open(module.params['plan_path'], 'w') as f:
+                json.dump(plan, f, indent=2, sort_keys=True)
+
+        result['plan'] = plan
+        result['summary'] = plan_summary(plan)
+        result['changed'] = len(plan) > 0
+        module.exit_json(**result)
+
+    except Exception as e:
+        module.fail_json(msg=str(e), result=result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
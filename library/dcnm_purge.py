@@ -0,0 +1,233 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""dcnm_purge module
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: dcnm_purge
+
+short_description: Tear down many VRFs and networks within Cisco DCNM
+
+version_added: "2.4"
+
+description:
+    - "Delete every network and VRF of a fabric matching a selector. The objects are resolved from one list request per object kind."
+    - "Networks are detached, undeployed and deleted in parallel before their VRFs. A selected VRF that still has networks which are not selected is left alone and reported in blocked_vrfs."
+
+options:
+  baseurl:
+    description:
+    - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
+    required: yes
+    type: list
+  username:
+    description:
+    - 'Username for DCNM API'
+    required: yes
+  password:
+    description:
+    - 'Password for DCNM API'
+    required: yes
+  verify:
+    description:
+    - 'Verify SSL certificates of DCNM REST API.'
+    required: no
+    type: bool
+    default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
+  fabric_name:
+    description:
+    - 'Fabric name with DCNM'
+    required: yes
+  name_pattern:
+    description:
+    - 'Shell style wildcard, e.g. "Tenant1_*". Networks and VRFs whose name matches are deleted.'
+    required: no
+  vrf_names:
+    description:
+    - 'VRFs to delete, together with all their networks.'
+    required: no
+    type: list
+  network_names:
+    description:
+    - 'Networks to delete.'
+    required: no
+    type: list
+  detach:
+    description:
+    - 'Detach the objects from all switches and undeploy them before deleting them.'
+    required: no
+    type: bool
+    default: yes
+  undeploy_timeout:
+    description:
+    - 'Seconds to wait for detached objects to be undeployed before deleting them.'
+    required: no
+    type: int
+    default: 300
+  workers:
+    description:
+    - 'Number of concurrent requests.'
+    required: no
+    type: int
+    default: 8
+
+author:
+    - Chris Gascoigne (@cgascoig)
+'''
+
+EXAMPLES = '''
+- name: tear down tenant 1
+  dcnm_purge:
+    <<: *api_info
+    fabric_name: MyFabric
+    name_pattern: "Tenant1_*"
+
+- name: delete two VRFs and all their networks
+  dcnm_purge:
+    <<: *api_info
+    fabric_name: MyFabric
+    vrf_names:
+      - MyVRF_50001
+      - MyVRF_50002
+'''
+
+RETURN = '''
+networks:
+    description: Names of the networks selected for deletion.
+    type: list
+vrfs:
+    description: Names of the VRFs selected for deletion.
+    type: list
+blocked_vrfs:
+    description: Selected VRFs that were not deleted because they still have networks which are not selected, with the names of those networks.
+    type: list
+progress:
+    description: One entry per teardown step with the number of objects, failures and the duration in seconds.
+    type: list
+failed_entries:
+    description: Objects that could not be detached or deleted, with their error.
+    type: list
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec
+from ansible.module_utils.dcnm_bulk import fetch_snapshot, select_teardown, teardown
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(dcnm_argument_spec)
+    module_args.update(
+        fabric_name=dict(type='str', required=True),
+        name_pattern=dict(type='str', required=False, default=None),
+        vrf_names=dict(type='list', required=False, default=None),
+        network_names=dict(type='list', required=False, default=None),
+        detach=dict(type='bool', required=False, default=True),
+        undeploy_timeout=dict(type='int', required=False, default=300),
+        workers=dict(type='int', required=False, default=8),
+    )
+
+    # seed the result dict
+    result = dict(
+        changed=False,
+        ansible_facts=dict()
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_one_of=[['name_pattern', 'vrf_names', 'network_names']],
+        supports_check_mode=True
+    )
+
+    try:
+        dcnm = dcnm_from_module(module)
+
+        dcnm.login()
+
+        snapshot = fetch_snapshot(dcnm, module.params['fabric_name'])
+        networks, vrfs, blocked = select_teardown(snapshot, module.params['name_pattern'], module.params['vrf_names'], module.params['network_names'])
+
+        result['networks'] = networks
+        result['vrfs'] = vrfs
+        result['blocked_vrfs'] = blocked
+        result['changed'] = len(networks) > 0 or len(vrfs) > 0
+
+        if module.check_mode:
+            module.exit_json(**result)
+
+        progress, failed = teardown(
+            dcnm, module.params['fabric_name'], networks, vrfs,
+            detach=module.params['detach'], workers=module.params['workers'],
+            undeploy_timeout=module.params['undeploy_timeout'], log=module.log,
+        )
+        result['progress'] = progress
+
+        if failed:
+            result['failed_entries'] = failed
+            module.fail_json(msg="%d objects could not be torn down" % len(failed), **result)
+
+        module.exit_json(**result)
+
+    except Exception as e:
+        module.fail_json(msg=str(e), result=result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""dcnm_sync module
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: dcnm_sync
+
+short_description: Incrementally detect VRF and network drift within Cisco DCNM
+
+version_added: "2.4"
+
+description:
+    - "Compare the VRFs and networks of a fabric with the state seen on the previous run and report what was added, modified or removed."
+    - "The last seen state is kept in a local SQLite database as one hash per object. Each run issues one list request per object kind and hashes every object, so a run costs one read of both lists plus hashing whatever has changed."
+
+options:
+  baseurl:
+    description:
+    - 'The base URL of the DCNM REST API. Usually of the form https://<DCNM_API>/rest'
+    - 'A list of base URLs of the nodes of a DCNM cluster can be given instead. Reads go to the fastest healthy node, writes to the first healthy node in the list, and a node that keeps failing is skipped for 30 seconds.'
+    required: yes
+    type: list
+  username:
+    description:
+    - 'Username for DCNM API'
+    required: yes
+  password:
+    description:
+    - 'Password for DCNM API'
+    required: yes
+  verify:
+    description:
+    - 'Verify SSL certificates of DCNM REST API.'
+    required: no
+    type: bool
+    default: yes
+  profile_dir:
+    description:
+    - 'Write a profile of the module run to this directory, as a speedscope JSON file plus collapsed stacks (sample mode) or a pstats file (cprofile mode). Can also be set with the DCNM_PROFILE_DIR environment variable.'
+    required: no
+    type: path
+  profile_mode:
+    description:
+    - 'How stacks are profiled when profile_dir is set. Can also be set with the DCNM_PROFILE_MODE environment variable.'
+    required: no
+    choices: [ sample, cprofile ]
+    default: sample
+  trace_output:
+    description:
+    - 'Export OpenTelemetry spans for the login, requests and VRF/network operations of the module run. Either a file the OTLP/JSON spans are appended to or an OTLP/HTTP collector URL, e.g. http://collector:4318/v1/traces. Can also be set with the DCNM_TRACE_OUTPUT environment variable.'
+    required: no
+  connect_timeout:
+    description:
+    - 'Seconds to wait for a connection to a DCNM node.'
+    required: no
+    type: float
+    default: 10
+  read_timeout:
+    description:
+    - 'Seconds to wait for a DCNM node to respond.'
+    required: no
+    type: float
+    default: 60
+  fabric_name:
+    description:
+    - 'Fabric name with DCNM'
+    required: yes
+  state_db:
+    description:
+    - 'Path of the local SQLite database holding the last seen state. It is created if it does not exist.'
+    required: yes
+    type: path
+
+author:
+    - Chris Gascoigne (@cgascoig)
+'''
+
+EXAMPLES = '''
+- name: detect drift since the last run
+  dcnm_sync:
+    <<: *api_info
+    fabric_name: MyFabric
+    state_db: /var/lib/dcnm/MyFabric.db
+  register: sync
+
+- name: output modified networks
+  debug:
+    msg: "{{ sync.drift.networks.modified }}"
+'''
+
+RETURN = '''
+drift:
+    description: Per object kind (vrfs, networks) lists of added, modified and removed object names. initial is true when there was no previous state for the kind.
+    type: dict
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.dcnm import dcnm_from_module, dcnm_argument_spec
+from ansible.module_utils.dcnm_store import DCNMStore, sync_fabric
+
+
+def run_module():
+    # define available arguments/parameters a user can pass to the module
+    module_args = dict(dcnm_argument_spec)
+    module_args.update(
+        fabric_name=dict(type='str', required=True),
+        state_db=dict(type='path', required=True),
+    )
+
+    # seed the result dict
+    result = dict(
+        changed=False,
+        ansible_facts=dict()
+    )
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    try:
+        dcnm = dcnm_from_module(module)
+
+        dcnm.login()
+
+        store = DCNMStore(module.params['state_db'])
+        try:
+            drift = sync_fabric(dcnm, store, module.params['fabric_name'], check_mode=module.check_mode)
+        finally:
+            store.close()
+
+        result['drift'] = drift
+        for report in drift.values():
+            if report['added'] or report['modified'] or report['removed']:
+                result['changed'] = True
+
+        module.exit_json(**result)
+
+    except Exception as e:
+        module.fail_json(msg=str(e), result=result)
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""dcnm_inventory lookup plugin
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+DOCUMENTATION = '''
+---
+lookup: dcnm_inventory
+
+short_description: Query the DCNM inventory persisted by dcnm_facts
+
+version_added: "2.4"
+
+description:
+    - "Answer queries against the SQLite inventory written by dcnm_facts with inventory_db, without contacting DCNM."
+
+options:
+  _terms:
+    description:
+    - 'The query to run. One of fabrics, vrfs, networks or free_vlans.'
+    required: yes
+  db:
+    description:
+    - 'Path of the SQLite inventory database written by dcnm_facts.'
+    required: yes
+  fabric:
+    description:
+    - 'Fabric name. Required for vrfs, networks and free_vlans. The fabric must be in the inventory, otherwise the lookup fails.'
+  vrf:
+    description:
+    - 'Only return networks attached to this VRF.'
+  start:
+    description:
+    - 'First VLAN ID considered by free_vlans.'
+    default: 2
+  end:
+    description:
+    - 'Last VLAN ID considered by free_vlans.'
+    default: 3967
+  count:
+    description:
+    - 'Maximum number of VLAN IDs returned by free_vlans. 0 returns all of them.'
+    default: 0
+
+author:
+    - Chris Gascoigne (@cgascoig)
+'''
+
+EXAMPLES = '''
+- name: networks in VRF MyVRF_50001
+  debug:
+    msg: "{{ lookup('dcnm_inventory', 'networks', db='/var/lib/dcnm/inventory.db', fabric='MyFabric', vrf='MyVRF_50001', wantlist=True) }}"
+
+- name: next free VLAN in MyFabric
+  debug:
+    msg: "{{ query('dcnm_inventory', 'free_vlans', db='/var/lib/dcnm/inventory.db', fabric='MyFabric', start=2300, end=2999, count=1) | first }}"
+'''
+
+RETURN = '''
+_raw:
+    description: Fabric, VRF or network objects as returned by the DCNM API, or VLAN IDs for free_vlans.
+    type: list
+'''
+
+import json
+import os
+import sqlite3
+
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        db = kwargs.get('db')
+        if db is None:
+            raise AnsibleError("dcnm_inventory: the db option is required")
+        if not os.path.exists(db):
+            raise AnsibleError("dcnm_inventory: inventory database %s does not exist, run dcnm_facts with inventory_db first" % db)
+
+        conn = sqlite3.connect(db)
+        try:
+            ret = []
+            for term in terms:
+                if term == 'fabrics':
+                    ret.extend(self.fabrics(conn))
+                elif term == 'vrfs':
+                    ret.extend(self.vrfs(conn, self.fabric(conn, db, kwargs)))
+                elif term == 'networks':
+                    ret.extend(self.networks(conn, self.fabric(conn, db, kwargs), kwargs.get('vrf')))
+                elif term == 'free_vlans':
+                    ret.extend(self.free_vlans(conn, self.fabric(conn, db, kwargs), int(kwargs.get('start', 2)), int(kwargs.get('end', 3967)), int(kwargs.get('count', 0))))
+                else:
+                    raise AnsibleError("dcnm_inventory: unknown query %s" % term)
+            return ret
+        except sqlite3.Error as e:
+            raise AnsibleError("dcnm_inventory: an error occurred while querying %s: %s" % (db, e))
+        finally:
+            conn.close()
+
+    def required(self, kwargs, name):
+        if kwargs.get(name) is None:
+            raise AnsibleError("dcnm_inventory: the %s option is required for this query" % name)
+        return kwargs[name]
+
+    # the fabric option, which must have been inventoried, otherwise an unknown
+    # fabric would look empty and all of its VLANs free
+    def fabric(self, conn, db, kwargs):
+        fabric = self.required(kwargs, 'fabric')
+        if conn.execute("SELECT 1 FROM inventory_marks WHERE fabric=?", (fabric,)).fetchone() is None:
+            raise AnsibleError("dcnm_inventory: fabric %s is not in inventory %s, run dcnm_facts with inventory_db first" % (fabric, db))
+        return fabric
+
+    def fabrics(self, conn):
+        rows = conn.execute("SELECT body FROM inventory_fabrics ORDER BY name")
+        return [json.loads(body) for (body,) in rows]
+
+    def vrfs(self, conn, fabric):
+        rows = conn.execute("SELECT body FROM inventory_vrfs WHERE fabric=? ORDER BY name", (fabric,))
+        return [json.loads(body) for (body,) in rows]
+
+    def networks(self, conn, fabric, vrf=None):
+        if vrf is None:
+            rows = conn.execute("SELECT body FROM inventory_networks WHERE fabric=? ORDER BY name", (fabric,))
+        else:
+            rows = conn.execute("SELECT body FROM inventory_networks WHERE fabric=? AND vrf=? ORDER BY name", (fabric, vrf))
+        return [json.loads(body) for (body,) in rows]
+
+    def free_vlans(self, conn, fabric, start, end, count):
+        used = set()
+        for table in ('inventory_vrfs', 'inventory_networks'):
+            rows = conn.execute("SELECT vlan_id FROM %s WHERE fabric=? AND vlan_id BETWEEN ? AND ?" % table, (fabric, start, end))
+            used.update(vlan_id for (vlan_id,) in rows)
+
+        free = []
+        for vlan_id in range(start, end + 1):
+            if vlan_id not in used:
+                free.append(vlan_id)
+                if count and len(free) >= count:
+                    break
+        return free
@@ -22,29 +22,239 @@ __copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.0"
 __author__ = "Chris Gascoigne"
 
+import time
+
+# used by the profiler to attribute time spent importing requests
+_IMPORT_STARTED = time.time()
+
 import requests
+from requests.packages.urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 import sys
 import json
+import contextlib
+import functools
+import threading
+
+from ansible.module_utils.basic import env_fallback
+from ansible.module_utils.dcnm_profile import Profiler, process_start_time
+from ansible.module_utils.dcnm_trace import OTLPTracer
+from ansible.module_utils.dcnm_model import iter_json_array
+
+_IMPORT_FINISHED = time.time()
 
 dcnm_argument_spec = dict(
-    baseurl=dict(type='str', required=True),
+    baseurl=dict(type='list', required=True),
     username=dict(type='str', required=True),
     password=dict(type='str', required=True, no_log=True),
     verify=dict(type='bool', required=False, default=True),
+    profile_dir=dict(type='path', required=False, default=None, fallback=(env_fallback, ['DCNM_PROFILE_DIR'])),
+    profile_mode=dict(type='str', choices=['sample', 'cprofile'], default='sample', fallback=(env_fallback, ['DCNM_PROFILE_MODE'])),
+    trace_output=dict(type='str', required=False, default=None, fallback=(env_fallback, ['DCNM_TRACE_OUTPUT'])),
+    connect_timeout=dict(type='float', required=False, default=10),
+    read_timeout=dict(type='float', required=False, default=60),
+)
+
+vrf_argument_spec = dict(
+    vrf_name=dict(type='str', required=True),
+    vrf_template=dict(type='str', required=False, default="Default_VRF_Universal"),
+    vrf_extension_template=dict(type='str', required=False, default="Default_VRF_Extension_Universal"),
+    vrf_template_config=dict(type='dict', required=True),
+    vrf_id=dict(type='int', required=True),
+    state=dict(type='str', choices=['present', 'absent'], default='present'),
+)
+
+network_argument_spec = dict(
+    vrf_name=dict(type='str', required=True),
+    network_name=dict(type='str', required=True),
+    network_id=dict(type='int', required=True),
+    network_template=dict(type='str', required=False, default="Default_Network_Universal"),
+    network_extension_template=dict(type='str', required=False, default="Default_Network_Extension_Universal"),
+    network_template_config=dict(type='dict', required=True),
+    state=dict(type='str', choices=['present', 'absent'], default='present'),
 )
 
+def dcnm_from_module(module):
+    dcnm = DCNM(
+        module.params['baseurl'], module.params['username'], module.params['password'], verify=module.params['verify'],
+        connect_timeout=module.params['connect_timeout'], read_timeout=module.params['read_timeout'],
+    )
+
+    if module.params['profile_dir'] is not None:
+        dcnm.tracers.append(Profiler(
+            module.params['profile_dir'],
+            mode=module.params['profile_mode'],
+            name=module._name,
+            phases=[
+                ('startup', process_start_time(), _IMPORT_STARTED),
+                ('import', _IMPORT_STARTED, _IMPORT_FINISHED),
+            ],
+        ))
+
+    if module.params['trace_output'] is not None:
+        dcnm.tracers.append(OTLPTracer(module.params['trace_output'], name=module._name))
+
+    return dcnm
+
+def operation(method):
+    # trace a VRF/network operation as a span named after the method, the
+    # methods either take (fabric_name, object_name) or module params
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attrs = dict()
+        if args and type(args[0]) is dict:
+            attrs['fabric'] = args[0].get('fabric_name')
+            attrs['object'] = args[0].get('network_name') or args[0].get('vrf_name')
+        else:
+            attrs['fabric'] = args[0] if len(args) > 0 else None
+            attrs['object'] = args[1] if len(args) > 1 else None
+        with self.span(method.__name__, **attrs):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def connect_failed(e):
+    # True when a request failed while connecting, before anything was sent to the node
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], 'reason', None) if e.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+class DCNMNodeError(Exception):
+    # raised when a node is unreachable or unhealthy and the request can be
+    # retried on another node
+    def __init__(self, error):
+        Exception.__init__(self, str(error))
+        self.error = error
+
+class DCNMTokenExpired(Exception):
+    # raised when a node rejects the token of a request, which is retried once after logging in again
+    pass
+
+class DCNMNode(object):
+    """A DCNM controller endpoint with its own token and circuit breaker.
+
+    After failure_threshold consecutive failures the breaker opens and the
+    node is skipped. Once reset_timeout seconds have passed a single caller
+    is let through (half-open) and the timer restarts, so the other callers
+    keep skipping the node until that trial request closes the breaker again
+    or another reset_timeout has passed.
+    """
+
+    def __init__(self, baseurl, failure_threshold=3, reset_timeout=30.0):
+        self.baseurl = baseurl
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.token = None
+        self.failures = 0
+        self.opened_at = None
+        # moving average of the response time, used to route reads to the fastest node
+        self.latency = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.time()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # half-open, this caller gets the trial request
+            self.opened_at = now
+            return True
+
+    def record_success(self, latency):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency = 0.8 * self.latency + 0.2 * latency
+
+    def record_failure(self, trip=False):
+        with self.lock:
+            self.failures += 1
+            if trip or self.failures >= self.failure_threshold or self.opened_at is not None:
+                # also re-open a half-open breaker straight away
+                self.opened_at = time.time()
+
 class DCNM(object):
-    def __init__(self, baseurl, username, password, verify=True):
+    # seconds to connect to and get an answer from a node when probing it
+    PROBE_TIMEOUT = 5.0
+
+    def __init__(self, baseurl, username, password, verify=True, connect_timeout=None, read_timeout=None):
         self.username = username
         self.password = password
         self.verify = verify
-        self.baseurl = baseurl
+        # baseurl is either a single URL or a list of URLs of the nodes of a DCNM cluster
+        if not isinstance(baseurl, (list, tuple)):
+            baseurl = [baseurl]
+        self.nodes = [DCNMNode(url) for url in baseurl]
+        self.baseurl = self.nodes[0].baseurl
+        self.timeout = (connect_timeout, read_timeout)
         self.token=None
+        # objects with start(name, attrs) and end(token, attrs, error) methods notified of every span
+        self.tracers=[]
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        tokens = [(tracer, tracer.start(name, attrs)) for tracer in self.tracers]
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            for tracer, token in reversed(tokens):
+                tracer.end(token, attrs, error)
 
     def get_url(self, endpoint):
         return self.baseurl + endpoint
 
+    # return the nodes to try for a request in order of preference, reads go
+    # to the fastest healthy node and writes to the first configured one
+    def candidates(self, method):
+        nodes = [node for node in self.nodes if node.available()]
+        if method == "GET":
+            nodes.sort(key=lambda node: node.latency if node.latency is not None else float('inf'))
+        return nodes
+
+    # lightweight health probe of every node, any HTTP response means the node
+    # is up. The nodes are probed in parallel with a short timeout so a node
+    # that accepts connections but never answers does not stall the login.
+    def probe(self):
+        timeout = tuple(self.PROBE_TIMEOUT if t is None else min(t, self.PROBE_TIMEOUT) for t in self.timeout)
+
+        def probe_node(node):
+            started = time.time()
+            try:
+                with self.span("probe", node=node.baseurl):
+                    requests.head(node.baseurl, verify=self.verify, timeout=timeout)
+                node.record_success(time.time() - started)
+            except requests.exceptions.RequestException:
+                node.record_failure(trip=True)
+
+        threads = [threading.Thread(target=probe_node, args=(node,)) for node in self.nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
     def login(self):
+        if len(self.nodes) > 1:
+            self.probe()
+
+        error = "no DCNM node available"
+        for node in self.candidates("POST"):
+            try:
+                self.token = self.login_node(node)
+                return self.token
+            except DCNMNodeError as e:
+                error = e.error
+
+        raise Exception("An error occurred while authenticating to DCNM: %s"%error)
+
+    def login_node(self, node):
         payload = "{'expirationTime': 60000}"
         body = {
             'expirationTime': 60000
@@ -54,45 +264,131 @@ class DCNM(object):
         }
 
         auth = requests.auth.HTTPBasicAuth(self.username, self.password)
-        url = self.get_url("/logon")
+        url = node.baseurl + "/logon"
 
         try:
-            response = requests.request("POST", url, auth=auth, json=body, headers=headers, verify=self.verify)
-
-            js = response.json()
-            self.token = js["Dcnm-Token"]
-
-            print("DCNM authenticated, token %s"%self.token)
+            with self.span("login", url=url) as attrs:
+                try:
+                    response = requests.request("POST", url, auth=auth, json=body, headers=headers, verify=self.verify, timeout=self.timeout)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    node.record_failure()
+                    raise DCNMNodeError(e)
+                attrs['status'] = response.status_code
+                node.record_success(response.elapsed.total_seconds())
+
+                js = response.json()
+                node.token = js["Dcnm-Token"]
+
+            print("DCNM authenticated, token %s"%node.token)
+        except DCNMNodeError:
+            raise
         except Exception as e:
             raise Exception("An error occurred while authenticating to DCNM: %s"%e)
             return None
         
-        return self.token
+        return node.token
 
-    def request(self, method, endpoint, json=None):
-        url = self.get_url(endpoint)
+    # with stream=True the response must be a JSON array and an iterator
+    # over its elements is returned instead of the decoded list
+    def request(self, method, endpoint, json=None, stream=False):
+        error = "no DCNM node available"
+        for node in self.candidates(method):
+            try:
+                try:
+                    return self.request_node(node, method, endpoint, json=json, stream=stream)
+                except DCNMTokenExpired:
+                    # the token expired, e.g. during a long teardown or import,
+                    # request_node logs in again when the node has no token
+                    return self.request_node(node, method, endpoint, json=json, stream=stream, relogin=False)
+            except DCNMNodeError as e:
+                # fail over to the next node
+                error = e.error
+
+        raise Exception("An error has occurred while sending request to DCNM: %s" % error)
+
+    def request_node(self, node, method, endpoint, json=None, stream=False, relogin=True):
+        if node.token is None:
+            self.login_node(node)
+
+        url = node.baseurl + endpoint
         headers = {
-            'Dcnm-Token': self.token
+            'Dcnm-Token': node.token
         }
         try:
-            response = requests.request(method, url, json=json, headers=headers, verify=self.verify)
-
-            if not response.ok:
-                raise Exception("%s: %s"%(response.reason, response.text))
-
-            try:
-                ret=response.json()
-            except ValueError:
-                ret=None
+            with self.span("request", method=method, endpoint=endpoint, node=node.baseurl) as attrs:
+                try:
+                    response = requests.request(method, url, json=json, headers=headers, verify=self.verify, timeout=self.timeout)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    node.record_failure()
+                    # a write that reached the node may still have been applied,
+                    # only retry reads and writes that could not connect
+                    if method == "GET" or connect_failed(e):
+                        raise DCNMNodeError(e)
+                    raise
+                attrs['status'] = response.status_code
+                # time until the response headers arrived, i.e. connect, TLS and server time
+                attrs['elapsed'] = response.elapsed.total_seconds()
+
+                if response.status_code in (502, 503, 504):
+                    node.record_failure()
+                    # like a timeout, a write that got a 502 or 504 from a proxy may
+                    # still have been applied, only a 503 means it was refused
+                    if method == "GET" or response.status_code == 503:
+                        raise DCNMNodeError("%s: %s"%(response.reason, response.text))
+                    raise Exception("%s: %s"%(response.reason, response.text))
+                node.record_success(response.elapsed.total_seconds())
+
+                if response.status_code == 401 and relogin:
+                    # unless another thread already logged in again
+                    if node.token == headers['Dcnm-Token']:
+                        node.token = None
+                    raise DCNMTokenExpired("%s: %s"%(response.reason, response.text))
+
+                if not response.ok:
+                    raise Exception("%s: %s"%(response.reason, response.text))
+
+                if stream:
+                    # raises straight away if the response is not an array
+                    ret=self.decode_stream(iter_json_array(response.text))
+                else:
+                    try:
+                        with self.span("decode"):
+                            ret=response.json()
+                    except ValueError:
+                        ret=None
 
             return ret
+        except (DCNMNodeError, DCNMTokenExpired):
+            raise
         except Exception as e:
             raise Exception("An error has occurred while sending request to DCNM: %s" % e)
             return None
 
+    # the elements of a streamed list response are decoded while the caller
+    # iterates, so that is where the decode span and decoding errors are
+    def decode_stream(self, elements):
+        with self.span("decode"):
+            try:
+                for element in elements:
+                    yield element
+            except ValueError as e:
+                raise Exception("An error has occurred while decoding a DCNM response: %s" % e)
+
     #################################
     # VRF related methods
     #################################
+    @operation
+    def get_vrfs(self, fabric_name, stream=False):
+        if self.token is None:
+            raise Exception("Attempt to list VRFs before authentication")
+
+        try:
+            vrfs=self.request("GET", "/top-down/fabrics/%s/vrfs"%fabric_name, stream=stream)
+            return vrfs or []
+        except Exception as e:
+            raise Exception("An error occurred while listing VRFs: %s" % e)
+
+    @operation
     def get_vrf(self, fabric_name, vrf_name):
         if self.token is None:
             raise Exception("Attempt to get VRF info before authentication")
@@ -104,6 +400,7 @@ class DCNM(object):
             # assume any exception means the VRF doesn't exist
             return None
 
+    @operation
     def delete_vrf(self, fabric_name, vrf_name):
         if self.token is None:
             raise Exception("Attempt to delete VRF before authentication")
@@ -114,6 +411,7 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while deleting VRF: %s" % e)
 
+    @operation
     def create_vrf(self, module_params):
         body = self.generate_body(module_params, self.VRF_ATTRS)
         body.update(
@@ -130,6 +428,7 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while creating VRF: %s"%e)
     
+    @operation
     def update_vrf(self, module_params):
         body = self.generate_body(module_params, self.VRF_ATTRS)
         body.update(
@@ -146,6 +445,53 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while updating VRF: %s"%e)
 
+    @operation
+    def get_vrf_attachments(self, fabric_name, vrf_names):
+        if self.token is None:
+            raise Exception("Attempt to get VRF attachments before authentication")
+
+        try:
+            attachments=self.request("GET", "/top-down/fabrics/%s/vrfs/attachments?vrf-names=%s"%(fabric_name, ",".join(vrf_names)))
+            return attachments or []
+        except Exception as e:
+            raise Exception("An error occurred while getting VRF attachments: %s" % e)
+
+    # detach every attached switch of the given attachments (as returned by
+    # get_vrf_attachments), returns the names of the VRFs that were attached
+    @operation
+    def detach_vrfs(self, fabric_name, attachments):
+        if self.token is None:
+            raise Exception("Attempt to detach VRFs before authentication")
+
+        body = []
+        for vrf in attachments:
+            lan_attach_list = [
+                dict(fabric=fabric_name, vrfName=vrf['vrfName'], serialNumber=attach['switchSerialNo'], vlan=attach.get('vlanId'), deployment=False)
+                for attach in vrf.get('lanAttachList') or []
+                if attach.get('isLanAttached')
+            ]
+            if lan_attach_list:
+                body.append(dict(vrfName=vrf['vrfName'], lanAttachList=lan_attach_list))
+
+        if not body:
+            return []
+
+        try:
+            self.request("POST", "/top-down/fabrics/%s/vrfs/attachments"%fabric_name, json=body)
+            return [obj['vrfName'] for obj in body]
+        except Exception as e:
+            raise Exception("An error occurred while detaching VRFs: %s" % e)
+
+    @operation
+    def deploy_vrfs(self, fabric_name, vrf_names):
+        if self.token is None:
+            raise Exception("Attempt to deploy VRFs before authentication")
+
+        try:
+            return self.request("POST", "/top-down/fabrics/%s/vrfs/deployments"%fabric_name, json={"vrfNames": ",".join(vrf_names)})
+        except Exception as e:
+            raise Exception("An error occurred while deploying VRFs: %s" % e)
+
     # return True if update needed
     def compare_vrf_attrs(self, js, yaml):
         return self.compare_attrs(js, yaml, self.VRF_ATTRS)
@@ -161,6 +507,18 @@ class DCNM(object):
     # Network related methods
     #################################
 
+    @operation
+    def get_nets(self, fabric_name, stream=False):
+        if self.token is None:
+            raise Exception("Attempt to list networks before authentication")
+
+        try:
+            nets=self.request("GET", "/top-down/fabrics/%s/networks"%fabric_name, stream=stream)
+            return nets or []
+        except Exception as e:
+            raise Exception("An error occurred while listing networks: %s" % e)
+
+    @operation
     def get_net(self, fabric_name, net_name):
         if self.token is None:
             raise Exception("Attempt to get network info before authentication")
@@ -172,6 +530,7 @@ class DCNM(object):
             # assume any exception means the network doesn't exist
             return None
 
+    @operation
     def delete_net(self, fabric_name, net_name):
         if self.token is None:
             raise Exception("Attempt to delete network before authentication")
@@ -182,6 +541,7 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while deleting network: %s" % e)
 
+    @operation
     def create_net(self, module_params):
         body = self.generate_body(module_params, self.NET_ATTRS)
         body.update(
@@ -199,6 +559,7 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while creating network: %s"%e)
     
+    @operation
     def update_net(self, module_params):
         body = self.generate_body(module_params, self.NET_ATTRS)
         body.update(
@@ -216,6 +577,53 @@ class DCNM(object):
         except Exception as e:
             raise Exception("An error occurred while updating network: %s"%e)
 
+    @operation
+    def get_net_attachments(self, fabric_name, net_names):
+        if self.token is None:
+            raise Exception("Attempt to get network attachments before authentication")
+
+        try:
+            attachments=self.request("GET", "/top-down/fabrics/%s/networks/attachments?network-names=%s"%(fabric_name, ",".join(net_names)))
+            return attachments or []
+        except Exception as e:
+            raise Exception("An error occurred while getting network attachments: %s" % e)
+
+    # detach every attached switch of the given attachments (as returned by
+    # get_net_attachments), returns the names of the networks that were attached
+    @operation
+    def detach_nets(self, fabric_name, attachments):
+        if self.token is None:
+            raise Exception("Attempt to detach networks before authentication")
+
+        body = []
+        for net in attachments:
+            lan_attach_list = [
+                dict(fabric=fabric_name, networkName=net['networkName'], serialNumber=attach['switchSerialNo'], vlan=attach.get('vlanId'), deployment=False)
+                for attach in net.get('lanAttachList') or []
+                if attach.get('isLanAttached')
+            ]
+            if lan_attach_list:
+                body.append(dict(networkName=net['networkName'], lanAttachList=lan_attach_list))
+
+        if not body:
+            return []
+
+        try:
+            self.request("POST", "/top-down/fabrics/%s/networks/attachments"%fabric_name, json=body)
+            return [obj['networkName'] for obj in body]
+        except Exception as e:
+            raise Exception("An error occurred while detaching networks: %s" % e)
+
+    @operation
+    def deploy_nets(self, fabric_name, net_names):
+        if self.token is None:
+            raise Exception("Attempt to deploy networks before authentication")
+
+        try:
+            return self.request("POST", "/top-down/fabrics/%s/networks/deployments"%fabric_name, json={"networkNames": ",".join(net_names)})
+        except Exception as e:
+            raise Exception("An error occurred while deploying networks: %s" % e)
+
     # return True if update needed
     def compare_net_attrs(self, js, yaml):
         return self.compare_attrs(js, yaml, self.NET_ATTRS)
@@ -233,22 +641,53 @@ class DCNM(object):
     
     # return True if update needed
     def compare_attrs(self, js, yaml, attrmap):
-        need_update=False
-        for jsattr, yamlattr in attrmap.iteritems():
+        return len(self.diff_attrs(js, yaml, attrmap)) > 0
+
+    # return the attributes that need updating as API attribute -> {before, after}
+    def diff_attrs(self, js, yaml, attrmap):
+        with self.span("compare"):
+            return self._diff_attrs(js, yaml, attrmap)
+
+    def _diff_attrs(self, js, yaml, attrmap):
+        diff=dict()
+        for jsattr, yamlattr in attrmap.items():
             if type(yaml[yamlattr]) is dict:
                 # if the attribute in the yaml is a dict, parse the json attribute as json
                 # this handles the vrfTemplateConfig and networkTemplateConfig attributes which are actually JSON encoded strings in the API
-                if json.loads(js[jsattr]) != yaml[yamlattr]:
-                    need_update = True
+                before = json.loads(js[jsattr])
+                after = yaml[yamlattr]
+                if before != after:
+                    # report template config differences per key
+                    diff[jsattr] = dict(
+                        (key, dict(before=before.get(key), after=after.get(key)))
+                        for key in set(before) | set(after)
+                        if before.get(key) != after.get(key)
+                    )
             else:
                 if js[jsattr] != yaml[yamlattr]:
-                    need_update = True
+                    diff[jsattr] = dict(before=js[jsattr], after=yaml[yamlattr])
+
+        return diff
 
-        return need_update
+    # reverse of generate_body, turn an API object into module params
+    def generate_params(self, js, attrmap):
+        params=dict()
+        for jsattr, yamlattr in attrmap.items():
+            value = js.get(jsattr)
+            # the template config attributes are JSON encoded strings in the API, see generate_body
+            if jsattr.endswith("TemplateConfig") and value:
+                value = json.loads(value)
+            params[yamlattr] = value
+
+        return params
 
     def generate_body(self, module_params, attrmap):
+        with self.span("encode"):
+            return self._generate_body(module_params, attrmap)
+
+    def _generate_body(self, module_params, attrmap):
         body=dict()
-        for jsattr, yamlattr in attrmap.iteritems():
+        for jsattr, yamlattr in attrmap.items():
             # if the attribute in the module_params is a dict, dump the attribute as json
             # this handles the vrfTemplateConfig and networkTemplateConfig attributes which are actually JSON encoded strings in the API
             if type(module_params[yamlattr]) is dict:
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""dcnm_bulk module utils
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import fnmatch
+import json
+import threading
+import time
+
+from ansible.module_utils.dcnm import DCNM
+from ansible.module_utils.dcnm_model import NetworkRecord, VrfRecord, index_records
+from ansible.module_utils.six.moves.queue import Queue, Empty
+
+# kind -> (snapshot key, name parameter, attribute map)
+PLAN_KINDS = {
+    'vrf': ('vrfs', 'vrf_name', DCNM.VRF_ATTRS),
+    'network': ('networks', 'network_name', DCNM.NET_ATTRS),
+}
+
+EXPORT_FORMAT = 'dcnm-fabric-config'
+EXPORT_VERSION = 1
+
+
+def fetch_snapshot(dcnm, fabric_name):
+    # one list request per object kind instead of a GET per object, the
+    # responses are decoded one object at a time into compact records
+    return dict(
+        vrfs=index_records(dcnm.get_vrfs(fabric_name, stream=True), VrfRecord),
+        networks=index_records(dcnm.get_nets(fabric_name, stream=True), NetworkRecord),
+    )
+
+
+def plan_kind(dcnm, snapshot, fabric_name, kind, items):
+    snapshot_key, name_param, attrmap = PLAN_KINDS[kind]
+    existing = snapshot[snapshot_key]
+
+    changes = []
+    deletes = []
+    for item in items:
+        name = item[name_param]
+        params = dict(item, fabric_name=fabric_name)
+        obj = existing.get(name)
+
+        if item['state'] == 'absent':
+            if obj is not None:
+                deletes.append(dict(action='delete', kind=kind, name=name, diff=dict(), params=params))
+            continue
+
+        if obj is None:
+            diff = dict((jsattr, dict(before=None, after=item[yamlattr])) for jsattr, yamlattr in attrmap.items())
+            changes.append(dict(action='create', kind=kind, name=name, diff=diff, params=params))
+            continue
+
+        diff = dcnm.diff_attrs(obj, item, attrmap)
+        if diff:
+            changes.append(dict(action='update', kind=kind, name=name, diff=diff, params=params))
+
+    return changes, deletes
+
+
+def plan_fabric(dcnm, snapshot, fabric_name, vrfs, networks):
+    """Compute the creates, updates and deletes needed for a whole inventory.
+
+    The plan is ordered so it can be applied as is: VRFs are created or
+    updated before the networks that use them, and networks are deleted
+    before their VRFs.
+    """
+    vrf_changes, vrf_deletes = plan_kind(dcnm, snapshot, fabric_name, 'vrf', vrfs)
+    net_changes, net_deletes = plan_kind(dcnm, snapshot, fabric_name, 'network', networks)
+
+    return vrf_changes + net_changes + net_deletes + vrf_deletes
+
+
+def plan_summary(plan):
+    summary = dict()
+    for entry in plan:
+        key = "%s_%s" % (entry['kind'], entry['action'])
+        summary[key] = summary.get(key, 0) + 1
+    return summary
+
+
+def run_parallel(func, items, workers):
+    """Call func for every item using a pool of worker threads.
+
+    Returns a list of (item, exception) for the calls that failed, the
+    remaining items are still processed when one of them fails.
+    """
+    queue = Queue()
+    for item in items:
+        queue.put(item)
+
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                func(item)
+            except Exception as e:
+                with lock:
+                    errors.append((item, e))
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(workers, len(items))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return errors
+
+
+def apply_entry(dcnm, entry):
+    params = entry['params']
+    if entry['action'] == 'delete':
+        if entry['kind'] == 'vrf':
+            dcnm.delete_vrf(params['fabric_name'], entry['name'])
+        else:
+            dcnm.delete_net(params['fabric_name'], entry['name'])
+    elif entry['kind'] == 'vrf':
+        if entry['action'] == 'create':
+            dcnm.create_vrf(params)
+        else:
+            dcnm.update_vrf(params)
+    else:
+        if entry['action'] == 'create':
+            dcnm.create_net(params)
+        else:
+            dcnm.update_net(params)
+
+
+def apply_plan(dcnm, plan, workers=8):
+    """Apply a plan from plan_fabric concurrently.
+
+    The plan is applied in phases, VRF creates/updates, network
+    creates/updates, network deletes and then VRF deletes, with the entries
+    of each phase running in parallel. A phase with failures stops the
+    following phases since they may depend on it. Returns the list of
+    failed entries with their error message.
+    """
+    phases = []
+    for entry in plan:
+        phase = (entry['kind'], entry['action'] == 'delete')
+        if not phases or phases[-1][0] != phase:
+            phases.append((phase, []))
+        phases[-1][1].append(entry)
+
+    for phase, entries in phases:
+        errors = run_parallel(lambda entry: apply_entry(dcnm, entry), entries, workers)
+        if errors:
+            return [dict(entry, error=str(e)) for entry, e in errors]
+
+    return []
+
+
+def export_fabric(dcnm, fabric_name, f):
+    """Write every VRF and network of a fabric to f as JSON lines.
+
+    The first line is a header with the format and version, every other line
+    is one object as {"kind": ..., "params": {...}} with the params in the
+    same form as the dcnm_vrf/dcnm_network module options. Returns the
+    number of VRFs and networks written.
+    """
+    f.write(json.dumps(dict(format=EXPORT_FORMAT, version=EXPORT_VERSION, fabric=fabric_name, exported_at=time.time())) + "\n")
+
+    counts = dict(vrf=0, network=0)
+    # the list responses are decoded and written one object at a time
+    for vrf in dcnm.get_vrfs(fabric_name, stream=True):
+        params = dcnm.generate_params(vrf, DCNM.VRF_ATTRS)
+        params.update(vrf_name=vrf['vrfName'])
+        f.write(json.dumps(dict(kind='vrf', params=params), sort_keys=True) + "\n")
+        counts['vrf'] += 1
+
+    for net in dcnm.get_nets(fabric_name, stream=True):
+        params = dcnm.generate_params(net, DCNM.NET_ATTRS)
+        params.update(network_name=net['networkName'], vrf_name=net['vrf'])
+        f.write(json.dumps(dict(kind='network', params=params), sort_keys=True) + "\n")
+        counts['network'] += 1
+
+    return counts
+
+
+def read_export(f):
+    # return the VRF and network params of a file written by export_fabric
+    header = json.loads(f.readline() or "{}")
+    if header.get('format') != EXPORT_FORMAT:
+        raise Exception("Not a DCNM fabric export")
+    if header.get('version') != EXPORT_VERSION:
+        raise Exception("Unsupported DCNM fabric export version %s" % header.get('version'))
+
+    vrfs = []
+    networks = []
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        params = dict(record['params'], state='present')
+        if record['kind'] == 'vrf':
+            vrfs.append(params)
+        elif record['kind'] == 'network':
+            networks.append(params)
+        else:
+            raise Exception("Unknown object kind %s in DCNM fabric export" % record['kind'])
+
+    return header, vrfs, networks
+
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def select_teardown(snapshot, name_pattern=None, vrf_names=None, network_names=None):
+    """Resolve a teardown selector against a snapshot.
+
+    Networks are selected when their name matches name_pattern (a shell
+    style wildcard), is in network_names or when their VRF is in vrf_names.
+    VRFs are selected when their name matches name_pattern or is in
+    vrf_names. Selected VRFs that still have networks which are not selected
+    cannot be deleted and are returned separately.
+    """
+    vrf_names = set(vrf_names or [])
+    network_names = set(network_names or [])
+
+    def matches(name):
+        return name_pattern is not None and fnmatch.fnmatchcase(name, name_pattern)
+
+    networks = sorted(
+        name for name, net in snapshot['networks'].items()
+        if matches(name) or name in network_names or net.get('vrf') in vrf_names
+    )
+    selected = set(networks)
+
+    vrfs = []
+    blocked = []
+    for name in sorted(snapshot['vrfs']):
+        if not (matches(name) or name in vrf_names):
+            continue
+        remaining = sorted(net_name for net_name, net in snapshot['networks'].items() if net.get('vrf') == name and net_name not in selected)
+        if remaining:
+            blocked.append(dict(name=name, networks=remaining))
+        else:
+            vrfs.append(name)
+
+    return networks, vrfs, blocked
+
+
+def wait_undeployed(list_method, name_attr, status_attr, names, timeout, interval=5):
+    # wait until none of the named objects is deployed or being deployed
+    names = set(names)
+    deadline = time.time() + timeout
+    while True:
+        pending = [obj[name_attr] for obj in list_method() if obj[name_attr] in names and obj.get(status_attr) not in (None, 'NA')]
+        if not pending or time.time() >= deadline:
+            return sorted(pending)
+        time.sleep(interval)
+
+
+def teardown(dcnm, fabric_name, networks, vrfs, detach=True, workers=8, batch_size=50, undeploy_timeout=300, log=None):
+    """Delete networks and then VRFs of a fabric, detaching them first.
+
+    Only objects that are attached to a switch are detached and deployed,
+    and only those are waited for to be undeployed.
+
+    Every step runs its batches or objects in parallel. Returns a progress
+    list with one entry per step and the list of failed entries; the VRF
+    steps are skipped when deleting the networks failed.
+    """
+    progress = []
+
+    def step(name, func, items):
+        started = time.time()
+        with dcnm.span("teardown_%s" % name, fabric=fabric_name, count=len(items)):
+            errors = func(items)
+        entry = dict(step=name, count=len(items), failed=len(errors), seconds=round(time.time() - started, 3))
+        progress.append(entry)
+        if log is not None:
+            log("dcnm teardown of %s: %s %d objects, %d failed in %ss" % (fabric_name, name, entry['count'], entry['failed'], entry['seconds']))
+        return errors
+
+    def undeploy(kind, names):
+        get_attachments, detach_objs, deploy = dict(
+            network=(dcnm.get_net_attachments, dcnm.detach_nets, dcnm.deploy_nets),
+            vrf=(dcnm.get_vrf_attachments, dcnm.detach_vrfs, dcnm.deploy_vrfs),
+        )[kind]
+
+        undeployed = []
+        lock = threading.Lock()
+
+        # only the objects that were attached somewhere need to be deployed
+        # for the detach to take effect
+        def undeploy_batch(batch):
+            detached = detach_objs(fabric_name, get_attachments(fabric_name, batch))
+            if detached:
+                deploy(fabric_name, detached)
+                with lock:
+                    undeployed.extend(detached)
+
+        errors = run_parallel(undeploy_batch, chunks(names, batch_size), workers)
+        failed = [dict(action='detach', kind=kind, name=name, error=str(e)) for batch, e in errors for name in batch]
+        if failed or not undeployed:
+            return failed
+
+        if kind == 'network':
+            pending = wait_undeployed(lambda: dcnm.get_nets(fabric_name), 'networkName', 'networkStatus', undeployed, undeploy_timeout)
+        else:
+            pending = wait_undeployed(lambda: dcnm.get_vrfs(fabric_name), 'vrfName', 'vrfStatus', undeployed, undeploy_timeout)
+        return [dict(action='detach', kind=kind, name=name, error="still deployed after %ss" % undeploy_timeout) for name in pending]
+
+    def delete(kind, names):
+        plan = [dict(action='delete', kind=kind, name=name, diff=dict(), params=dict(fabric_name=fabric_name)) for name in names]
+        return apply_plan(dcnm, plan, workers=workers)
+
+    for kind, names in (('network', networks), ('vrf', vrfs)):
+        if not names:
+            continue
+        if detach:
+            failed = step("undeploy_%ss" % kind, lambda names: undeploy(kind, names), names)
+            if failed:
+                return progress, failed
+        failed = step("delete_%ss" % kind, lambda names: delete(kind, names), names)
+        if failed:
+            return progress, failed
+
+    return progress, []
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""dcnm_model module utils
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import json
+import re
+import sys
+
+try:
+    intern = sys.intern
+except AttributeError:
+    # python 2, intern is a builtin
+    pass
+
+
+class SnapshotRecord(object):
+    """Compact, read-only view of a VRF or network returned by the API.
+
+    Snapshots of large fabrics hold tens of thousands of objects, so instead
+    of the API dicts only the attributes the bulk operations use are kept in
+    __slots__. Values shared by many objects (template names, VRF names,
+    statuses) are interned and the template config is kept JSON encoded.
+    It is parsed each time it is compared rather than cached, a plan
+    compares every object once and holding the parsed configs of a whole
+    fabric would more than double its size.
+
+    Records support obj[attr] and obj.get(attr) with the API attribute names
+    so they can be passed wherever an API dict is expected.
+    """
+
+    # API attribute -> slot, set by subclasses
+    FIELDS = {}
+    # API attributes whose values are interned
+    INTERNED = ()
+
+    __slots__ = ()
+
+    def __init__(self, obj):
+        for attr, slot in self.FIELDS.items():
+            value = obj.get(attr)
+            if attr in self.INTERNED and isinstance(value, str):
+                value = intern(value)
+            setattr(self, slot, value)
+
+    def __getitem__(self, attr):
+        try:
+            return getattr(self, self.FIELDS[attr])
+        except KeyError:
+            raise KeyError(attr)
+
+    def get(self, attr, default=None):
+        if attr not in self.FIELDS:
+            return default
+        value = getattr(self, self.FIELDS[attr])
+        return default if value is None else value
+
+    def to_dict(self):
+        return dict((attr, getattr(self, slot)) for attr, slot in self.FIELDS.items())
+
+
+class VrfRecord(SnapshotRecord):
+    FIELDS = {
+        'vrfName': 'name',
+        'vrfTemplate': 'template',
+        'vrfExtensionTemplate': 'extension_template',
+        'vrfTemplateConfig': 'template_config',
+        'vrfId': 'vrf_id',
+        'vrfStatus': 'status',
+    }
+    INTERNED = ('vrfTemplate', 'vrfExtensionTemplate', 'vrfStatus')
+
+    __slots__ = ('name', 'template', 'extension_template', 'template_config', 'vrf_id', 'status')
+
+
+class NetworkRecord(SnapshotRecord):
+    FIELDS = {
+        'networkName': 'name',
+        'vrf': 'vrf',
+        'networkTemplate': 'template',
+        'networkExtensionTemplate': 'extension_template',
+        'networkTemplateConfig': 'template_config',
+        'networkId': 'network_id',
+        'networkStatus': 'status',
+    }
+    INTERNED = ('vrf', 'networkTemplate', 'networkExtensionTemplate', 'networkStatus')
+
+    __slots__ = ('name', 'vrf', 'template', 'extension_template', 'template_config', 'network_id', 'status')
+
+
+_WHITESPACE = re.compile(r'\s*')
+
+def iter_json_array(text):
+    """Decode the elements of a JSON array one at a time.
+
+    Unlike json.loads this never holds every element of a large list
+    response at once, so they can be turned into records as they come.
+    Whether text is an array is checked straight away, malformed elements
+    raise ValueError while iterating.
+    """
+    idx = _WHITESPACE.match(text, 0).end()
+    if text[idx:].strip() in ('', 'null'):
+        return iter(())
+    if text[idx:idx + 1] != '[':
+        raise ValueError("Expected a JSON array")
+    return _iter_elements(text, idx + 1)
+
+
+def _iter_elements(text, idx):
+    decoder = json.JSONDecoder()
+    idx = _WHITESPACE.match(text, idx).end()
+    while text[idx:idx + 1] != ']':
+        obj, idx = decoder.raw_decode(text, idx)
+        yield obj
+        # exactly one comma between elements, none after the last one
+        idx = _WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] == ',':
+            idx = _WHITESPACE.match(text, idx + 1).end()
+            if text[idx:idx + 1] == ']':
+                raise ValueError("Trailing comma at position %d" % idx)
+        elif text[idx:idx + 1] != ']':
+            raise ValueError("Expected ',' or ']' at position %d" % idx)
+    if text[idx + 1:].strip():
+        raise ValueError("Extra data after the JSON array at position %d" % (idx + 1))
+
+
+def index_records(objs, record_class):
+    """Turn an iterable of API objects into a dict of name -> record.
+
+    Pass an iterator such as iter_json_array so every API dict can be freed
+    as soon as its record exists, keeping the peak memory close to one copy
+    of the snapshot.
+    """
+    records = dict()
+    for obj in objs:
+        record = record_class(obj)
+        records[record.name] = record
+    return records
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""dcnm_profile module utils
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+def process_start_time():
+    # wall clock time the current process was started, this includes the
+    # AnsiballZ wrapper start up which happens before any of our code runs.
+    # Only available on Linux, returns None elsewhere.
+    try:
+        with open("/proc/self/stat") as f:
+            # the command name may contain spaces, the fields we need follow the closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/stat") as f:
+            btime = [int(line.split()[1]) for line in f if line.startswith("btime")][0]
+        return btime + float(start_ticks) / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return None
+
+
+class Profiler(object):
+    """Collect wall clock spans and stack samples of a module run.
+
+    Spans are recorded through DCNM.span(). On exit everything is written to
+    output_dir as a speedscope profile (<name>-<pid>.speedscope.json) and, in
+    sample mode, as collapsed stacks (<name>-<pid>.folded) for flamegraph.pl.
+    In cprofile mode a pstats file (<name>-<pid>.prof) is written instead of
+    the stack samples, covering the threads started after the profiler too
+    (e.g. the run_parallel workers).
+    """
+
+    def __init__(self, output_dir, mode='sample', name='dcnm', interval=0.005, phases=None):
+        self.output_dir = output_dir
+        self.mode = mode
+        self.name = name
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.spans = []
+        self.samples = dict()
+        self.started = process_start_time() or time.time()
+
+        for phase_name, start, end in phases or []:
+            if start is not None and end is not None:
+                self.spans.append(dict(name=phase_name, start=start, end=end, thread=threading.current_thread().ident, attrs=dict()))
+
+        self.profile = None
+        self.thread_profiles = []
+        self.sampler = None
+        self.stopped = threading.Event()
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            # before python 3.12 cProfile only profiles the thread that enabled
+            # it, give every thread started from now on a profile of its own
+            if sys.version_info < (3, 12):
+                threading.setprofile(self.profile_thread)
+        else:
+            self.sampler = threading.Thread(target=self.sample, name="dcnm-profiler")
+            self.sampler.daemon = True
+            self.sampler.start()
+
+        atexit.register(self.dump)
+
+    def start(self, name, attrs):
+        span = dict(name=name, start=time.time(), end=None, thread=threading.current_thread().ident, attrs=attrs)
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def end(self, span, attrs, error):
+        span['end'] = time.time()
+        if error is not None:
+            span['attrs']['error'] = str(error)
+
+    # profile hook of new threads, replaced by a cProfile of the thread on its first event
+    def profile_thread(self, frame, event, arg):
+        profile = cProfile.Profile()
+        with self.lock:
+            if self.stopped.is_set():
+                sys.setprofile(None)
+                return
+            self.thread_profiles.append(profile)
+        profile.enable()
+
+    def sample(self):
+        own = threading.current_thread().ident
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack = tuple(reversed(stack))
+                with self.lock:
+                    self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def dump(self):
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        ended = time.time()
+
+        if self.profile is not None:
+            self.profile.disable()
+            threading.setprofile(None)
+        if self.sampler is not None:
+            self.sampler.join()
+
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        base = os.path.join(self.output_dir, "%s-%d" % (self.name, os.getpid()))
+
+        frames = []
+        frame_index = dict()
+
+        def frame_id(key, frame):
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                frames.append(frame)
+            return frame_index[key]
+
+        profiles = []
+
+        # one evented profile per thread, speedscope requires the open and
+        # close events of a profile to be properly nested
+        spans_by_thread = dict()
+        for span in self.spans:
+            spans_by_thread.setdefault(span['thread'], []).append(span)
+        for ident, spans in sorted(spans_by_thread.items()):
+            events = []
+            for span in spans:
+                end = span['end'] if span['end'] is not None else ended
+                fid = frame_id(('span', span['name']), dict(name=span['name']))
+                events.append((span['start'] - self.started, 1, -end, "O", fid))
+                events.append((end - self.started, 0, -span['start'], "C", fid))
+            events.sort()
+            profiles.append({
+                "type": "evented",
+                "name": "%s phases (thread %d)" % (self.name, ident),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": ended - self.started,
+                "events": [dict(type=kind, frame=fid, at=at) for at, _, _, kind, fid in events],
+            })
+
+        if self.samples:
+            samples = []
+            weights = []
+            with open(base + ".folded", "w") as f:
+                for stack, count in sorted(self.samples.items()):
+                    samples.append([frame_id(('code',) + key, dict(name=key[0], file=key[1], line=key[2])) for key in stack])
+                    weights.append(count * self.interval)
+                    f.write("%s %d\n" % (";".join("%s (%s:%d)" % key for key in stack), count))
+            profiles.append({
+                "type": "sampled",
+                "name": "%s samples" % self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+
+        if self.profile is not None:
+            stats = pstats.Stats(self.profile)
+            with self.lock:
+                for profile in self.thread_profiles:
+                    stats.add(profile)
+            stats.dump_stats(base + ".prof")
+
+        with open(base + ".speedscope.json", "w") as f:
+            json.dump({
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "name": self.name,
+                "exporter": "dcnm-ansible",
+                "shared": {"frames": frames},
+                "profiles": profiles,
+            }, f)
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""dcnm_store module utils
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import hashlib
+import json
+import sqlite3
+import time
+
+from ansible.module_utils.dcnm import DCNM
+from ansible.module_utils.dcnm_model import NetworkRecord, VrfRecord, index_records
+
+# bump this whenever the schema changes, older databases are emptied when
+# opened since they only hold a cache of DCNM data
+SCHEMA_VERSION = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    fabric TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (fabric, kind, name)
+);
+CREATE TABLE IF NOT EXISTS marks (
+    fabric TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    list_hash TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (fabric, kind)
+);
+CREATE TABLE IF NOT EXISTS inventory_fabrics (
+    name TEXT NOT NULL PRIMARY KEY,
+    body TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inventory_marks (
+    fabric TEXT NOT NULL PRIMARY KEY,
+    saved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inventory_vrfs (
+    fabric TEXT NOT NULL,
+    name TEXT NOT NULL,
+    vrf_id INTEGER,
+    vlan_id INTEGER,
+    body TEXT NOT NULL,
+    PRIMARY KEY (fabric, name)
+);
+CREATE TABLE IF NOT EXISTS inventory_networks (
+    fabric TEXT NOT NULL,
+    name TEXT NOT NULL,
+    vrf TEXT,
+    network_id INTEGER,
+    vlan_id INTEGER,
+    body TEXT NOT NULL,
+    PRIMARY KEY (fabric, name)
+);
+CREATE INDEX IF NOT EXISTS inventory_networks_vrf ON inventory_networks (fabric, vrf);
+CREATE INDEX IF NOT EXISTS inventory_networks_vlan ON inventory_networks (fabric, vlan_id);
+CREATE INDEX IF NOT EXISTS inventory_vrfs_vlan ON inventory_vrfs (fabric, vlan_id);
+"""
+
+# kind -> (name attribute, attributes compared for drift, list method)
+# the template config attributes are JSON encoded strings in the API so they
+# are parsed before hashing, otherwise a key re-ordering on the DCNM side
+# would be reported as drift
+KINDS = {
+    'vrfs': ('vrfName', list(DCNM.VRF_ATTRS), DCNM.get_vrfs),
+    'networks': ('networkName', list(DCNM.NET_ATTRS) + ['vrf'], DCNM.get_nets),
+}
+
+
+def object_hash(obj, attrs):
+    fields = dict()
+    for attr in attrs:
+        value = obj.get(attr)
+        if attr.endswith('TemplateConfig') and value:
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        fields[attr] = value
+
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def list_hash(hashes):
+    digest = hashlib.sha1()
+    for name in sorted(hashes):
+        digest.update(("%s=%s\n" % (name, hashes[name])).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DCNMStore(object):
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS objects; DROP TABLE IF EXISTS marks; "
+                "DROP TABLE IF EXISTS inventory_fabrics; DROP TABLE IF EXISTS inventory_marks; "
+                "DROP TABLE IF EXISTS inventory_vrfs; DROP TABLE IF EXISTS inventory_networks;"
+            )
+            self.conn.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_mark(self, fabric_name, kind):
+        row = self.conn.execute("SELECT list_hash, synced_at FROM marks WHERE fabric=? AND kind=?", (fabric_name, kind)).fetchone()
+        return row
+
+    def get_hashes(self, fabric_name, kind):
+        rows = self.conn.execute("SELECT name, hash FROM objects WHERE fabric=? AND kind=?", (fabric_name, kind))
+        return dict(rows)
+
+    def save(self, fabric_name, kind, upserts, removed, new_list_hash):
+        # upserts is a list of (name, hash) tuples
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO objects (fabric, kind, name, hash, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(fabric_name, kind, name, h, now) for name, h in upserts]
+            )
+            self.conn.executemany(
+                "DELETE FROM objects WHERE fabric=? AND kind=? AND name=?",
+                [(fabric_name, kind, name) for name in removed]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO marks (fabric, kind, list_hash, synced_at) VALUES (?, ?, ?, ?)",
+                (fabric_name, kind, new_list_hash, now)
+            )
+
+    def save_inventory(self, fabrics, objects):
+        # fabrics is the full /control/fabrics response, objects yields
+        # (fabric name, VRFs, networks) with the VRFs and networks as iterables
+        # of API objects. It is consumed inside the transaction so the objects
+        # of one fabric at a time are fetched and written, and every fabric
+        # it yields is replaced as a whole. Fabrics that no longer exist in
+        # DCNM are removed together with their VRFs and networks.
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM inventory_fabrics")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO inventory_fabrics (name, body, updated_at) VALUES (?, ?, ?)",
+                [(fabric['fabricName'], json.dumps(fabric), now) for fabric in fabrics]
+            )
+            for fabric_name, vrfs, networks in objects:
+                self.conn.execute("DELETE FROM inventory_vrfs WHERE fabric=?", (fabric_name,))
+                self.conn.executemany(
+                    "INSERT INTO inventory_vrfs (fabric, name, vrf_id, vlan_id, body) VALUES (?, ?, ?, ?, ?)",
+                    ((fabric_name, vrf['vrfName'], vrf.get('vrfId'), template_config_int(vrf, 'vrfTemplateConfig', 'vrfVlanId'), json.dumps(vrf)) for vrf in vrfs)
+                )
+                self.conn.execute("DELETE FROM inventory_networks WHERE fabric=?", (fabric_name,))
+                self.conn.executemany(
+                    "INSERT INTO inventory_networks (fabric, name, vrf, network_id, vlan_id, body) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((fabric_name, net['networkName'], net.get('vrf'), net.get('networkId'), template_config_int(net, 'networkTemplateConfig', 'vlanId'), json.dumps(net)) for net in networks)
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO inventory_marks (fabric, saved_at) VALUES (?, ?)",
+                    (fabric_name, now)
+                )
+            for table in ('inventory_vrfs', 'inventory_networks', 'inventory_marks'):
+                self.conn.execute("DELETE FROM %s WHERE fabric NOT IN (SELECT name FROM inventory_fabrics)" % table)
+
+    def snapshot(self, fabric_name):
+        # return the inventoried VRFs and networks of a fabric in the same
+        # form as dcnm_bulk.fetch_snapshot
+        if self.conn.execute("SELECT 1 FROM inventory_marks WHERE fabric=?", (fabric_name,)).fetchone() is None:
+            raise Exception("Fabric %s is not in inventory %s, run dcnm_facts with inventory_db first" % (fabric_name, self.path))
+
+        vrfs = self.conn.execute("SELECT body FROM inventory_vrfs WHERE fabric=?", (fabric_name,))
+        networks = self.conn.execute("SELECT body FROM inventory_networks WHERE fabric=?", (fabric_name,))
+        # rows are converted one at a time so only the compact records are held
+        return dict(
+            vrfs=index_records((json.loads(body) for (body,) in vrfs), VrfRecord),
+            networks=index_records((json.loads(body) for (body,) in networks), NetworkRecord),
+        )
+
+
+def template_config_int(obj, config_attr, key):
+    # pull an integer (e.g. a VLAN ID) out of the JSON encoded template config
+    try:
+        return int(json.loads(obj[config_attr])[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def sync_fabric(dcnm, store, fabric_name, check_mode=False):
+    """Compare the current DCNM objects of a fabric with the last seen state.
+
+    DCNM does not expose a change feed for top-down objects, so every run
+    fetches each kind with a single list request and hashes every object,
+    i.e. drift detection costs one list read plus hashing. When the
+    list-level hash matches the stored one the stored per-object hashes are
+    not read and nothing is written.
+    """
+    drift = dict()
+
+    for kind, (name_attr, attrs, list_method) in KINDS.items():
+        objects = list_method(dcnm, fabric_name)
+        hashes = dict()
+        for obj in objects:
+            hashes[obj[name_attr]] = object_hash(obj, attrs)
+        new_list_hash = list_hash(hashes)
+
+        mark = store.get_mark(fabric_name, kind)
+        report = dict(initial=mark is None, added=[], modified=[], removed=[])
+        drift[kind] = report
+
+        if mark is not None and mark[0] == new_list_hash:
+            continue
+
+        seen = store.get_hashes(fabric_name, kind)
+        report['added'] = sorted(name for name in hashes if name not in seen)
+        report['modified'] = sorted(name for name in hashes if name in seen and seen[name] != hashes[name])
+        report['removed'] = sorted(name for name in seen if name not in hashes)
+
+        if not check_mode:
+            upserts = [(name, hashes[name]) for name in report['added'] + report['modified']]
+            store.save(fabric_name, kind, upserts, report['removed'], new_list_hash)
+
+    return drift
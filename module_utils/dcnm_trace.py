@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""dcnm_trace module utils
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import atexit
+import binascii
+import json
+import os
+import threading
+import time
+
+import requests
+
+# span attribute -> OpenTelemetry attribute name, anything else is prefixed with dcnm.
+ATTRIBUTE_NAMES = {
+    'method': 'http.request.method',
+    'status': 'http.response.status_code',
+    'url': 'url.full',
+    'endpoint': 'url.path',
+}
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+def random_id(nbytes):
+    return binascii.hexlify(os.urandom(nbytes)).decode('ascii')
+
+
+def time_unix_nano(t):
+    # OTLP/JSON encodes 64 bit integers as strings
+    return str(int(t * 1e9))
+
+
+def otlp_value(value):
+    if type(value) is bool:
+        return dict(boolValue=value)
+    if isinstance(value, int):
+        return dict(intValue=str(value))
+    if isinstance(value, float):
+        return dict(doubleValue=value)
+    return dict(stringValue=str(value))
+
+
+def otlp_attributes(attrs):
+    return [dict(key=key, value=otlp_value(value)) for key, value in sorted(attrs.items()) if value is not None]
+
+
+class OTLPTracer(object):
+    """Export DCNM spans in the OpenTelemetry OTLP/JSON format.
+
+    All spans of a module run are sent in one ExportTraceServiceRequest when
+    the module exits. If output is an http(s) URL it is POSTed to it (e.g.
+    http://collector:4318/v1/traces), otherwise it is appended as a single
+    line to the file at that path, as the OpenTelemetry file exporter does.
+
+    A root span named after the module covers the whole run. If the
+    TRACEPARENT environment variable holds a W3C trace context the root span
+    joins that trace, so module runs can be correlated with the playbook.
+    """
+
+    def __init__(self, output, name='dcnm', service_name='dcnm-ansible'):
+        self.output = output
+        self.service_name = service_name
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.finished = []
+        self.flushed = False
+
+        self.trace_id = random_id(16)
+        parent_id = None
+        traceparent = os.environ.get('TRACEPARENT', '').split('-')
+        if len(traceparent) == 4 and len(traceparent[1]) == 32 and len(traceparent[2]) == 16:
+            self.trace_id = traceparent[1]
+            parent_id = traceparent[2]
+
+        self.root = self.new_span(name, dict(), parent_id, SPAN_KIND_INTERNAL)
+
+        atexit.register(self.flush)
+
+    def new_span(self, name, attrs, parent_id, kind):
+        return dict(
+            traceId=self.trace_id,
+            spanId=random_id(8),
+            parentSpanId=parent_id,
+            name=name,
+            kind=kind,
+            start=time.time(),
+            attrs=attrs,
+        )
+
+    def stack(self):
+        # spans are nested per thread, spans of worker threads hang off the root span
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def start(self, name, attrs):
+        stack = self.stack()
+        parent = stack[-1] if stack else self.root
+        kind = SPAN_KIND_CLIENT if name in ('login', 'request') else SPAN_KIND_INTERNAL
+        span = self.new_span(name, attrs, parent['spanId'], kind)
+        stack.append(span)
+        return span
+
+    def end(self, span, attrs, error):
+        stack = self.stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        self.finish(span, error)
+
+    def finish(self, span, error):
+        ended = time.time()
+        attrs = dict(('dcnm.%s' % key if key not in ATTRIBUTE_NAMES else ATTRIBUTE_NAMES[key], value) for key, value in span['attrs'].items())
+        attrs['dcnm.latency_ms'] = (ended - span['start']) * 1000.0
+
+        otlp = dict(
+            traceId=span['traceId'],
+            spanId=span['spanId'],
+            name=span['name'],
+            kind=span['kind'],
+            startTimeUnixNano=time_unix_nano(span['start']),
+            endTimeUnixNano=time_unix_nano(ended),
+            attributes=otlp_attributes(attrs),
+            status=dict(code=STATUS_CODE_OK),
+        )
+        if span['parentSpanId'] is not None:
+            otlp['parentSpanId'] = span['parentSpanId']
+        if error is not None:
+            otlp['status'] = dict(code=STATUS_CODE_ERROR, message=str(error))
+
+        with self.lock:
+            self.finished.append(otlp)
+
+    def flush(self):
+        if self.flushed:
+            return
+        self.flushed = True
+        self.finish(self.root, None)
+
+        payload = dict(resourceSpans=[dict(
+            resource=dict(attributes=otlp_attributes({'service.name': self.service_name})),
+            scopeSpans=[dict(scope=dict(name='dcnm-ansible'), spans=self.finished)],
+        )])
+
+        # tracing must never fail the module run
+        try:
+            if self.output.startswith('http://') or self.output.startswith('https://'):
+                requests.post(self.output, json=payload, timeout=10)
+            else:
+                with open(self.output, 'a') as f:
+                    f.write(json.dumps(payload) + "\n")
+        except Exception:
+            pass
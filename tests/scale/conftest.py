@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Fixtures of the scale regression suite
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import contextlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+FAKE_DCNM = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_dcnm.py')
+
+FABRIC = "fabric1"
+
+# fabric sizes (VRFs + networks) to run every test with, 50000 takes minutes
+DEFAULT_SIZES = "10,1000"
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        sizes = [int(size) for size in os.environ.get('DCNM_SCALE_SIZES', DEFAULT_SIZES).split(",")]
+        metafunc.parametrize('size', sizes, ids=["%d_objects" % size for size in sizes])
+
+
+class FakeDCNMProcess(object):
+    """A fake_dcnm.py server running in a child process.
+
+    The server runs in its own process so generating and serving the
+    fabric is not part of the time and memory measured for the module.
+    """
+
+    def __init__(self, fabric_name, size, token_uses=0):
+        self.proc = subprocess.Popen(
+            [sys.executable, FAKE_DCNM, '--fabric', "%s=%d" % (fabric_name, size), '--token-uses', str(token_uses)],
+            stdout=subprocess.PIPE,
+        )
+        self.baseurl = self.proc.stdout.readline().decode('utf-8').strip()
+        if not self.baseurl:
+            raise Exception("fake DCNM did not start")
+        self.root = self.baseurl[:-len("/rest")]
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait()
+        self.proc.stdout.close()
+
+    def requests(self):
+        import requests
+        return [tuple(r) for r in requests.get(self.root + "/fake/requests").json()]
+
+    def reset(self):
+        import requests
+        requests.post(self.root + "/fake/reset")
+
+    def count(self, method=None, path=None):
+        # number of requests, optionally only those with this method and a path containing path
+        return len([1 for m, p in self.requests() if (method is None or m == method) and (path is None or path in p)])
+
+    def args(self, **kwargs):
+        # module arguments connecting to this server
+        return dict(kwargs, baseurl=[self.baseurl], username="admin", password="admin", verify=False)
+
+
+@pytest.fixture
+def fake_dcnm(size):
+    fake = FakeDCNMProcess(FABRIC, size)
+    try:
+        yield fake
+    finally:
+        fake.stop()
+
+
+class ModuleExit(BaseException):
+    # raised by exit_json/fail_json, a BaseException so the modules'
+    # "except Exception" blocks do not turn a successful exit into a failure
+    def __init__(self, result):
+        super(ModuleExit, self).__init__(result)
+        self.result = result
+
+
+class ModuleRun(object):
+    def __init__(self, result, seconds, peak_bytes):
+        self.result = result
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+
+def load_library(name):
+    spec = importlib.util.spec_from_file_location("library_%s" % name, os.path.join(ROOT, 'library', "%s.py" % name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def run_module():
+    """Return a function running a module in this process.
+
+    run_module(name, args, check_mode=False) returns a ModuleRun with the
+    module result, its wall time and the peak memory it allocated (as
+    traced by tracemalloc).
+    """
+    import ansible.module_utils
+    from ansible.module_utils import basic
+
+    # the repo's module_utils are bundled into ansible.module_utils when a
+    # module is shipped to a host, make them importable the same way
+    module_utils = os.path.abspath(os.path.join(ROOT, 'module_utils'))
+    if module_utils not in ansible.module_utils.__path__:
+        ansible.module_utils.__path__.append(module_utils)
+
+    try:
+        from ansible.module_utils.testing import patch_module_args
+    except ImportError:
+        @contextlib.contextmanager
+        def patch_module_args(args):
+            saved = basic._ANSIBLE_ARGS
+            basic._ANSIBLE_ARGS = json.dumps(dict(ANSIBLE_MODULE_ARGS=args)).encode('utf-8')
+            try:
+                yield
+            finally:
+                basic._ANSIBLE_ARGS = saved
+
+    def exit_json(self, **kwargs):
+        kwargs.setdefault('failed', False)
+        raise ModuleExit(kwargs)
+
+    def fail_json(self, **kwargs):
+        kwargs['failed'] = True
+        raise ModuleExit(kwargs)
+
+    modules = dict()
+
+    def run(name, args, check_mode=False):
+        if name not in modules:
+            modules[name] = load_library(name)
+        if check_mode:
+            args = dict(args, _ansible_check_mode=True)
+
+        result = None
+        with patch_module_args(args):
+            saved = basic.AnsibleModule.exit_json, basic.AnsibleModule.fail_json
+            basic.AnsibleModule.exit_json, basic.AnsibleModule.fail_json = exit_json, fail_json
+            tracemalloc.start()
+            started = time.time()
+            try:
+                modules[name].run_module()
+            except ModuleExit as e:
+                result = e.result
+            finally:
+                seconds = time.time() - started
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                basic.AnsibleModule.exit_json, basic.AnsibleModule.fail_json = saved
+
+        if result is None:
+            raise Exception("%s returned without calling exit_json or fail_json" % name)
+        return ModuleRun(result, seconds, peak_bytes)
+
+    return run
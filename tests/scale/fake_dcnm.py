@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""A local fake of the DCNM REST API serving synthetic fabrics
+
+Run it as a separate process so its memory and CPU use do not count
+towards the module under test:
+
+    python tests/scale/fake_dcnm.py --fabric fabric1=1000 [--token-uses 100]
+
+The base URL is printed on the first line of stdout. GET /fake/requests
+returns the (method, path) of every API request served so far and POST
+/fake/reset clears that list. With --token-uses every token expires after
+that many requests, as DCNM tokens do after their expiration time.
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import argparse
+import json
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+OBJECT_PATH = re.compile(r'^/rest/top-down/fabrics/([^/]+)/(vrfs|networks)(?:/([^/]+))?$')
+
+# kind -> (name attribute, status attribute, names query parameter)
+KINDS = {
+    'vrfs': ('vrfName', 'vrfStatus', 'vrf-names'),
+    'networks': ('networkName', 'networkStatus', 'network-names'),
+}
+
+
+def synthetic_vrf(fabric_name, i):
+    name = "Tenant%d_VRF_%d" % (i // 100, 50000 + i)
+    return dict(
+        fabric=fabric_name, vrfName=name, vrfTemplate="Default_VRF_Universal",
+        vrfExtensionTemplate="Default_VRF_Extension_Universal", vrfId=50000 + i,
+        vrfTemplateConfig=json.dumps(dict(
+            vrfSegmentId=str(50000 + i), vrfName=name, vrfVlanId=str(2 + i % 1000), asn="65500", nveId="1",
+        )),
+        vrfStatus="DEPLOYED",
+    )
+
+
+def synthetic_network(fabric_name, i, vrf_name):
+    name = "Tenant%d_Net_%d" % (i // 900, 30000 + i)
+    return dict(
+        fabric=fabric_name, networkName=name, vrf=vrf_name,
+        networkTemplate="Default_Network_Universal", networkExtensionTemplate="Default_Network_Extension_Universal",
+        networkId=30000 + i,
+        networkTemplateConfig=json.dumps(dict(
+            segmentId=str(30000 + i), vrfName=vrf_name, networkName=name, vlanId=str(1002 + i % 2900),
+            gatewayIpAddress="10.%d.%d.1/24" % (i // 256 % 256, i % 256), mcastGroup="239.1.1.0", nveId="1",
+            suppressArp="true", isLayer2Only="false",
+        )),
+        networkStatus="DEPLOYED",
+    )
+
+
+def synthetic_fabric(fabric_name, size):
+    """Return (vrfs, networks) of a fabric with size objects, one VRF per nine networks."""
+    vrf_count = max(1, size // 10)
+    vrfs = [synthetic_vrf(fabric_name, i) for i in range(vrf_count)]
+    networks = [synthetic_network(fabric_name, i, vrfs[i % vrf_count]['vrfName']) for i in range(max(0, size - vrf_count))]
+    return vrfs, networks
+
+
+class FakeDCNM(object):
+    """Serve synthetic fabrics over HTTP on a local port and record requests.
+
+    Implements the parts of the DCNM REST API used by the modules: logon,
+    fabrics, VRF and network CRUD, attachments and deployments. Objects with
+    a status are attached to one switch. Deploying clears the status of the
+    named objects, as if they were detached and undeployed straight away.
+    """
+
+    def __init__(self, token_uses=0):
+        self.lock = threading.Lock()
+        self.fabrics = OrderedDict()
+        self.requests = []
+        # token -> number of requests it is still valid for, None if it never expires
+        self.token_uses = token_uses
+        self.tokens = dict()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def baseurl(self):
+        return "http://127.0.0.1:%d/rest" % self.server.server_address[1]
+
+    def add_fabric(self, fabric_name, size):
+        vrfs, networks = synthetic_fabric(fabric_name, size)
+        self.fabrics[fabric_name] = dict(
+            vrfs=OrderedDict((vrf['vrfName'], vrf) for vrf in vrfs),
+            networks=OrderedDict((net['networkName'], net) for net in networks),
+        )
+        return vrfs, networks
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests = []
+
+    def handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                fake.record(self.command, self.path)
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self.dispatch()
+
+            def do_POST(self):
+                self.dispatch()
+
+            def do_PUT(self):
+                self.dispatch()
+
+            def do_DELETE(self):
+                self.dispatch()
+
+            def dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+                if self.path == "/fake/requests":
+                    with fake.lock:
+                        return self.reply(200, fake.requests)
+                if self.path == "/fake/reset":
+                    fake.reset_counts()
+                    return self.reply(200, dict())
+
+                fake.record(self.command, self.path)
+
+                if self.path != "/rest/logon" and not fake.use_token(self.headers.get("Dcnm-Token")):
+                    return self.reply(401, dict(message="invalid token"))
+
+                status, payload = fake.handle(self.command, self.path, body)
+                self.reply(status, payload)
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def new_token(self):
+        with self.lock:
+            token = "fake-dcnm-token-%d" % len(self.tokens)
+            self.tokens[token] = self.token_uses or None
+            return token
+
+    def use_token(self, token):
+        with self.lock:
+            if token not in self.tokens:
+                return False
+            if self.tokens[token] is None:
+                return True
+            if self.tokens[token] <= 0:
+                return False
+            self.tokens[token] -= 1
+            return True
+
+    def record(self, method, path):
+        with self.lock:
+            self.requests.append((method, urlparse(path).path))
+
+    def handle(self, method, path, body):
+        url = urlparse(path)
+
+        if url.path == "/rest/logon" and method == "POST":
+            return 200, {"Dcnm-Token": self.new_token()}
+
+        if url.path == "/rest/control/fabrics" and method == "GET":
+            return 200, [dict(fabricName=name, id=i) for i, name in enumerate(self.fabrics)]
+
+        match = OBJECT_PATH.match(url.path)
+        if match is None or match.group(1) not in self.fabrics:
+            return 404, dict(message="not found")
+
+        fabric_name, kind, name = match.groups()
+        name_attr, status_attr, names_param = KINDS[kind]
+        with self.lock:
+            objects = self.fabrics[fabric_name][kind]
+
+            if name == "attachments":
+                if method == "GET":
+                    names = parse_qs(url.query).get(names_param, [""])[0].split(",")
+                    return 200, [
+                        {name_attr: n, 'lanAttachList': [dict(switchSerialNo="FDO0001", vlanId=1, isLanAttached=status_attr in objects[n])]}
+                        for n in names if n in objects
+                    ]
+                return 200, dict()
+
+            if name == "deployments":
+                names = body[name_attr + "s"].split(",")
+                for n in names:
+                    if n in objects:
+                        objects[n].pop(status_attr, None)
+                return 200, dict()
+
+            if name is None:
+                if method == "GET":
+                    return 200, list(objects.values())
+                if method == "POST":
+                    if body[name_attr] in objects:
+                        return 400, dict(message="%s already exists" % body[name_attr])
+                    objects[body[name_attr]] = body
+                    return 200, body
+
+            elif name not in objects:
+                return 404, dict(message="%s not found" % name)
+            elif method == "GET":
+                return 200, objects[name]
+            elif method == "PUT":
+                objects[name] = body
+                return 200, body
+            elif method == "DELETE":
+                del objects[name]
+                return 200, None
+
+        return 405, dict(message="method not allowed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic fabrics with a fake DCNM REST API")
+    parser.add_argument('--fabric', action='append', default=[], metavar='NAME=SIZE', help='fabric to serve with SIZE VRFs and networks')
+    parser.add_argument('--token-uses', type=int, default=0, help='number of requests a token is valid for, 0 for tokens that never expire')
+    args = parser.parse_args()
+
+    fake = FakeDCNM(token_uses=args.token_uses)
+    for fabric in args.fabric:
+        name, size = fabric.split("=")
+        fake.add_fabric(name, int(size))
+
+    print(fake.baseurl)
+    sys.stdout.flush()
+    fake.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
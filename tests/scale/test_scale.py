@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Scale regression tests of the DCNM modules
+
+Every module runs in process against a fake DCNM serving a synthetic
+fabric (see fake_dcnm.py) and the test asserts the number of API requests
+it made, its wall time and the peak memory it allocated. The request
+counts are exact since they must not grow with the fabric, the time and
+memory budgets grow linearly with it.
+
+The fabric sizes are taken from the DCNM_SCALE_SIZES environment variable
+(default "10,1000"), e.g. DCNM_SCALE_SIZES=50000 python -m pytest tests/scale
+
+Copyright (c) 2019 Cisco and/or its affiliates.
+
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.0 (the "License"). You may obtain a copy of the
+License at
+
+               https://developer.cisco.com/docs/licenses
+
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+
+"""
+
+__copyright__ = "Copyright (c) 2019 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.0"
+__author__ = "Chris Gascoigne"
+
+import json
+
+import pytest
+
+pytest.importorskip("ansible")
+pytest.importorskip("requests")
+
+from conftest import FABRIC, FakeDCNMProcess
+from fake_dcnm import synthetic_fabric, synthetic_vrf
+
+# budgets: fixed part + per object part, the wall time includes tracemalloc overhead
+BASE_SECONDS = 3.0
+BASE_BYTES = 16 * 1024 * 1024
+
+
+def assert_within(run, size, seconds_per_object, bytes_per_object):
+    assert not run.result['failed'], run.result.get('msg')
+    seconds = BASE_SECONDS + size * seconds_per_object
+    assert run.seconds <= seconds, "took %.2fs, budget %.2fs" % (run.seconds, seconds)
+    peak = BASE_BYTES + size * bytes_per_object
+    assert run.peak_bytes <= peak, "peak %.1f MB, budget %.1f MB" % (run.peak_bytes / 1048576.0, peak / 1048576.0)
+
+
+def vrf_params(vrf):
+    return dict(
+        vrf_name=vrf['vrfName'], vrf_id=vrf['vrfId'], vrf_template=vrf['vrfTemplate'],
+        vrf_extension_template=vrf['vrfExtensionTemplate'], vrf_template_config=json.loads(vrf['vrfTemplateConfig']),
+    )
+
+
+def network_params(net):
+    return dict(
+        network_name=net['networkName'], vrf_name=net['vrf'], network_id=net['networkId'],
+        network_template=net['networkTemplate'], network_extension_template=net['networkExtensionTemplate'],
+        network_template_config=json.loads(net['networkTemplateConfig']),
+    )
+
+
+def test_facts_inventory(run_module, fake_dcnm, size, tmp_path):
+    run = run_module('dcnm_facts', fake_dcnm.args(inventory_db=str(tmp_path / "inventory.db")))
+
+    # each fabric is written as its list responses are decoded
+    assert_within(run, size, 0.0005, 2 * 1024)
+    # login, fabrics and one list request per object kind
+    assert fake_dcnm.count() == 4
+    assert fake_dcnm.count('GET', '/vrfs') == 1
+    assert fake_dcnm.count('GET', '/networks') == 1
+
+
+def test_vrf_create(run_module, fake_dcnm, size):
+    vrf = synthetic_vrf(FABRIC, size)
+    run = run_module('dcnm_vrf', fake_dcnm.args(fabric_name=FABRIC, **vrf_params(vrf)))
+
+    assert_within(run, size, 0.0, 0)
+    assert run.result['changed']
+    assert fake_dcnm.count() == 3
+    assert fake_dcnm.count('POST', '/vrfs') == 1
+
+
+def test_vrf_unchanged(run_module, fake_dcnm, size):
+    vrfs, networks = synthetic_fabric(FABRIC, size)
+    run = run_module('dcnm_vrf', fake_dcnm.args(fabric_name=FABRIC, **vrf_params(vrfs[-1])))
+
+    assert_within(run, size, 0.0, 0)
+    assert not run.result['changed']
+    assert fake_dcnm.count() == 2
+
+
+def test_network_update(run_module, fake_dcnm, size):
+    vrfs, networks = synthetic_fabric(FABRIC, size)
+    params = network_params(networks[-1])
+    params['network_template_config']['vlanId'] = "3999"
+    run = run_module('dcnm_network', fake_dcnm.args(fabric_name=FABRIC, **params))
+
+    assert_within(run, size, 0.0, 0)
+    assert run.result['changed']
+    assert fake_dcnm.count() == 3
+    assert fake_dcnm.count('PUT', '/networks/%s' % params['network_name']) == 1
+
+
+def test_api(run_module, fake_dcnm, size):
+    run = run_module('dcnm_api', fake_dcnm.args(method="GET", endpoint="/top-down/fabrics/%s/vrfs" % FABRIC))
+
+    assert_within(run, size, 0.0005, 1024)
+    assert len(run.result['response']) == max(1, size // 10)
+    assert fake_dcnm.count() == 2
+
+
+def test_plan(run_module, fake_dcnm, size):
+    vrfs, networks = synthetic_fabric(FABRIC, size)
+    vrf_items = [vrf_params(vrf) for vrf in vrfs]
+    net_items = [network_params(net) for net in networks]
+    net_items[0]['network_template_config']['vlanId'] = "3999"
+    del vrfs, networks
+
+    run = run_module('dcnm_plan', fake_dcnm.args(fabric_name=FABRIC, vrfs=vrf_items, networks=net_items), check_mode=True)
+
+    # the module arguments are most of the peak, the snapshot records are far smaller
+    assert_within(run, size, 0.002, 8 * 1024)
+    assert run.result['summary'] == dict(network_update=1)
+    assert fake_dcnm.count() == 3
+
+
+def test_plan_from_inventory(run_module, fake_dcnm, size, tmp_path):
+    inventory_db = str(tmp_path / "inventory.db")
+    run_module('dcnm_facts', fake_dcnm.args(inventory_db=inventory_db))
+    fake_dcnm.reset()
+
+    vrf = synthetic_vrf(FABRIC, size)
+    run = run_module('dcnm_plan', fake_dcnm.args(fabric_name=FABRIC, vrfs=[vrf_params(vrf)], snapshot_db=inventory_db), check_mode=True)
+
+    assert_within(run, size, 0.0005, 1024)
+    assert run.result['summary'] == dict(vrf_create=1)
+    assert fake_dcnm.count() == 0
+
+
+def test_sync(run_module, fake_dcnm, size, tmp_path):
+    args = fake_dcnm.args(fabric_name=FABRIC, state_db=str(tmp_path / "state.db"))
+    run = run_module('dcnm_sync', args)
+
+    assert_within(run, size, 0.0005, 4 * 1024)
+    assert len(run.result['drift']['vrfs']['added']) == max(1, size // 10)
+    assert fake_dcnm.count() == 3
+
+    # without drift both lists are still read once
+    fake_dcnm.reset()
+    run = run_module('dcnm_sync', args)
+
+    assert_within(run, size, 0.0005, 4 * 1024)
+    assert not run.result['changed']
+    assert fake_dcnm.count() == 3
+
+
+def test_fabric_config_export(run_module, fake_dcnm, size, tmp_path):
+    run = run_module('dcnm_fabric_config', fake_dcnm.args(fabric_name=FABRIC, path=str(tmp_path / "fabric1.jsonl"), mode='export'))
+
+    # objects are written as they are decoded, only the response body is held
+    assert_within(run, size, 0.0005, 2 * 1024)
+    assert run.result['counts']['vrf'] + run.result['counts']['network'] == size
+    assert fake_dcnm.count() == 3
+
+
+def test_purge_vrf(run_module, fake_dcnm, size):
+    vrfs, networks = synthetic_fabric(FABRIC, size)
+    vrf_name = vrfs[0]['vrfName']
+    net_names = [net['networkName'] for net in networks if net['vrf'] == vrf_name]
+    del vrfs, networks
+
+    run = run_module('dcnm_purge', fake_dcnm.args(fabric_name=FABRIC, vrf_names=[vrf_name]))
+
+    assert_within(run, size, 0.0005, 4 * 1024)
+    assert run.result['networks'] == sorted(net_names)
+    assert run.result['vrfs'] == [vrf_name]
+    # the selection is resolved from one snapshot, then per kind: attachments,
+    # detach and deploy per batch of 50, a list request to wait for the
+    # undeploy and a delete per object
+    batches = (len(net_names) + 49) // 50
+    assert fake_dcnm.count('DELETE') == len(net_names) + 1
+    assert fake_dcnm.count() == 3 + (3 * batches + 1 + len(net_names)) + (3 + 1 + 1)
+
+
+def test_purge_never_deployed(run_module, fake_dcnm, size):
+    vrfs, networks = synthetic_fabric(FABRIC, size)
+    params = network_params(networks[0])
+    params.update(network_name="Unused_Net", network_id=29999)
+    del vrfs, networks
+    run_module('dcnm_network', fake_dcnm.args(fabric_name=FABRIC, **params))
+    fake_dcnm.reset()
+
+    run = run_module('dcnm_purge', fake_dcnm.args(fabric_name=FABRIC, network_names=["Unused_Net"]))
+
+    assert_within(run, size, 0.0005, 4 * 1024)
+    assert run.result['networks'] == ["Unused_Net"]
+    # nothing is attached, so nothing is detached, deployed or waited for
+    assert fake_dcnm.count('POST', '/deployments') == 0
+    assert fake_dcnm.count() == 3 + 1 + 1
+
+
+def test_purge_token_expiry(run_module, size):
+    # tokens expire every 5 requests, the client logs in again and retries
+    fake = FakeDCNMProcess(FABRIC, size, token_uses=5)
+    try:
+        vrfs, networks = synthetic_fabric(FABRIC, size)
+        vrf_name = vrfs[0]['vrfName']
+        net_names = [net['networkName'] for net in networks if net['vrf'] == vrf_name]
+        del vrfs, networks
+
+        run = run_module('dcnm_purge', fake.args(fabric_name=FABRIC, vrf_names=[vrf_name]))
+
+        # the module fails if a request is rejected after logging in again
+        assert_within(run, size, 0.0005, 4 * 1024)
+        assert run.result['networks'] == sorted(net_names)
+        assert fake.count('POST', '/logon') > 1
+    finally:
+        fake.stop()